@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+"""
+Wall time for many argv sets: `xargs -P J -L 1 devapp <module>` vs.
+`devapp --batch - -j J <module>`.
+
+    python benchmarks/bench_batch.py [lines] [jobs]
+
+Both run the tutorial calculator (tests/tutorial/calc.py) for lines
+(default 200) argv sets, jobs (default 4) at a time.
+"""
+from __future__ import print_function
+import os
+import sys
+import time
+import subprocess as sp
+
+here = os.path.dirname(os.path.abspath(__file__))
+tut = os.path.join(here, '..', 'tests', 'tutorial')
+src = os.path.join(here, '..', 'src')
+devapp = [sys.executable, '-c', 'from devapps.app import run; run()']
+
+
+def timed(cmd, inp):
+    t0 = time.time()
+    p = sp.Popen(cmd, cwd=tut, stdin=sp.PIPE, stdout=sp.PIPE)
+    out = p.communicate(inp)[0]
+    return time.time() - t0, len(out.splitlines())
+
+
+def main(lines=200, jobs=4):
+    os.environ['PYTHONPATH'] = os.path.abspath(src)
+    inp = ''.join(['of=mul a=%s b=7\n' % i for i in range(lines)]).encode()
+    xargs = ['xargs', '-P', str(jobs), '-L', '1'] + devapp + ['./calc.py']
+    batch = devapp + ['--batch', '-', '-j', str(jobs), './calc.py']
+    for name, cmd in (('xargs', xargs), ('batch', batch)):
+        dt, n = timed(cmd, inp)
+        print('%-6s %7.2f s for %s results' % (name, dt, n))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+"""
+Scaling of the argument binding (map_args_to_func_sig) with the number of
+positional args, e.g. `app do_process $(find ...)`.
+
+    python benchmarks/bench_binding.py [max_args]
+
+Shows time per call and per arg - the latter should stay flat (linear).
+The `configure` column is a full configure run via the CLI provider.
+"""
+from __future__ import print_function
+import sys
+import time
+
+from devapps import configure, CLI
+from devapps.func_sigs import map_args_to_func_sig
+
+
+class App:
+    def do_process(app, mode='fast', level=1, *files):
+        return len(files)
+
+
+def f(app, mode='fast', level=1, *files):
+    pass
+
+
+def timeit(func, min_time=0.2):
+    n, t0 = 0, time.time()
+    while True:
+        func()
+        n += 1
+        dt = time.time() - t0
+        if dt > min_time:
+            return dt / n
+
+
+def main(max_args=100000):
+    cols = ('args', 'binding [ms]', 'per arg [us]', 'configure [ms]')
+    print('%8s %14s %14s %14s' % cols)
+    n = 10
+    while n <= max_args:
+        files = ['/tmp/file%s' % i for i in range(n)]
+        cli = [('level', '2')] + [(fn, 'is_set') for fn in files]
+        t = timeit(lambda: map_args_to_func_sig(f, cli, {}, map_from=1))
+        argv = ['process', 'level=2'] + files
+        tc = timeit(lambda: configure(App, CLI(argv)))
+        res = (n, t * 1000, t / n * 1e6, tc * 1000)
+        print('%8s %14.3f %14.3f %14.3f' % res)
+        n *= 10
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
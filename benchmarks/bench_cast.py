@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+"""
+Casting, the innermost loop for big lists (CLI, File).
+
+    python benchmarks/bench_cast.py [n]
+
+n (default 1M) scalars cast one by one, and as elements of one list.
+Bulk parsing of a CLI string into typed arrays (array.array, numpy if
+installed), with the size of the result. A JSON blob (dict of n / 50 items)
+parsed as by the Env provider and casting, vs. literal_eval. n / 10 records
+cast against a nested dict schema, vs. casting them key by key.
+"""
+from __future__ import print_function
+import sys
+import json
+import time
+from array import array
+from ast import literal_eval
+
+from devapps.casting import cast
+
+
+class MyInt(int):
+    # found via the mro:
+    pass
+
+
+def size(v):
+    """Bytes of a result, incl. the boxed items of lists, tuples"""
+    if isinstance(v, (list, tuple)):
+        return sys.getsizeof(v) + sum([sys.getsizeof(i) for i in v])
+    return getattr(v, 'nbytes', None) or sys.getsizeof(v)
+
+
+def timed(name, n, func):
+    t0 = time.time()
+    res = func()
+    dt = time.time() - t0
+    print(
+        '%-28s %10.3f s %10.1f ns/item %8.1f MB'
+        % (name, dt, dt / n * 1e9, size(res) / 1e6)
+    )
+
+
+def main(n=1000000):
+    strs = [str(i) for i in range(n)]
+    timed('scalars str -> int', n, lambda: [cast(s, 1) for s in strs])
+    timed('scalars str -> float', n, lambda: [cast(s, 1.0) for s in strs])
+    timed('scalars int subclass', n, lambda: [cast(s, MyInt(1)) for s in strs])
+    timed('list elements -> int', n, lambda: cast(strs, [1]))
+    timed('tuple elements -> float', n, lambda: cast(strs, (1.0,)))
+    s = ','.join(strs)
+    timed('cli string -> [int]', n, lambda: cast(s, [1]))
+    timed('cli string -> array q', n, lambda: cast(s, array('q')))
+    timed('cli string -> array d', n, lambda: cast(s, array('d')))
+    m = n // 50
+    d = dict([('k%s' % i, [i, 'v%s' % i, {'x': i * 1.5}]) for i in range(m)])
+    s = json.dumps(d)
+    timed('json blob literal_eval', m, lambda: literal_eval(s))
+    timed('json blob -> {}', m, lambda: cast(s, {}))
+    m = n // 10
+    schema = {'id': 0, 'w': 1.0, 'tags': [str], 'pos': {'x': 0.0, 'y': 0.0}}
+    recs = [
+        {'id': str(i), 'w': '1.5', 'tags': [1, 2], 'pos': {'x': '1', 'y': 2}}
+        for i in range(m)
+    ]
+
+    def by_key():
+        c = lambda r: dict([(k, cast(v, schema[k])) for k, v in r.items()])
+        return [c(r) for r in recs]
+
+    timed('records by key', m, by_key)
+    timed('records -> [schema]', m, lambda: cast(recs, [schema]))
+    try:
+        import numpy as np
+    except ImportError:
+        return
+    a = np.zeros(0, dtype=np.int64)
+    timed('cli string -> ndarray int64', n, lambda: cast(s, a))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
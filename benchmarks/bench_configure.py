@@ -0,0 +1,317 @@
+#!/usr/bin/env python
+"""
+configure, phase by phase, on synthetic App class trees.
+
+    python benchmarks/bench_configure.py [-q] [--save] [match ...]
+
+-q:     quick, small sizes only (what the test suite runs)
+--save: store the results as new baselines
+match:  run only the scenarios with names containing one of the matches
+
+The generators vary the number of attrs (10 to 10k), the nesting depth (1 to
+20), the number of do_ actions, long, short or prefix keys and the providers
+(CLI, Env with a big os.environ, big JSON File). Phases measured:
+
+    pre_parse_cli  CLI.pre_parse_cli of the argv
+    short_to_long  mapping of the (short) CLI keys at the top level
+    compile        devapps.compile (class scan, w/o disk cache), plan building
+    cast           casting all the CLI values into the attrs' types
+    map_args       map_args_to_func_sig for the action run
+    walk_attrs     resolving the provider values against the plan
+    configure      full devapps.configure, warm (plan and classes cached)
+    cold           compile plus first configure of a new App class
+
+Times in ms, the best of a few runs. Results are compared against
+baselines.json (same directory) - slower than `tolerance` times the baseline
+is reported as regression, with exit code 1. Baseline times are scaled by
+the ratio of a calibration loop (pure python, run now and at --save), so
+a busier or slower box does not report everything. Still, re-create them
+with --save when switching the box.
+"""
+from __future__ import print_function
+import os
+import sys
+import json
+import time
+import string
+import tempfile
+
+import devapps
+from devapps import configure, CLI, Env, File, short_to_long, walk_attrs
+from devapps.casting import cast
+from devapps.func_sigs import map_args_to_func_sig
+
+here = os.path.dirname(os.path.abspath(__file__))
+fn_baselines = os.path.join(here, 'baselines.json')
+tolerance = 1.5
+slack = 0.05  # ms, below that all is noise
+
+
+# ------------------------------------------------------------------ Generators
+letters = string.ascii_lowercase
+# (default value, cli value) - cycled through by the attrs:
+values = [
+    (1, '42'),
+    ('s', 'foo'),
+    (True, 'false'),
+    (1.5, '2.5'),
+    ([1], '[1,2]'),
+]
+
+
+def names(n, offs=0):
+    """Attr names with unique short forms (ax_bx_cx -> abc)"""
+    l, r = letters, []
+    for i in range(offs, offs + n):
+        parts = l[i // 676 % 26], l[i // 26 % 26], l[i % 26]
+        r.append('%sx_%sx_%sx' % parts)
+    return r
+
+
+def short(k):
+    return devapps.shorten(k)[0]
+
+
+def action(name, n_params):
+    """do_<name>(app, <params with defaults>)"""
+    params = names(n_params, 10000)
+    dflts = ['%s=%r' % (p, values[i % 5][0]) for i, p in enumerate(params)]
+    src = 'def do_%s(app, %s):\n    return 1\n' % (name, ', '.join(dflts))
+    ns = {}
+    exec(src, ns)
+    return ns['do_' + name], params
+
+
+def make_app(n_attrs=10, depth=1, n_actions=1, n_params=3):
+    """App with n_attrs attrs at every nesting level, nested via 'nested'.
+    The actions (root level only): run plus named like the attrs.
+    """
+    cls = None
+    for level in range(depth, 0, -1):
+        ns = {}
+        for i, k in enumerate(names(n_attrs)):
+            ns[k] = values[i % 5][0]
+        if cls:
+            ns['nested'] = cls
+        cls = type('Level%s' % level, (object,), ns)
+    for name in ['run'] + names(n_actions - 1, 14000):
+        setattr(cls, 'do_' + name, action(name, n_params)[0])
+    cls.__name__ = 'App'
+    return cls
+
+
+def make_cfg(n_attrs=10, depth=1, n_params=3):
+    """The provider values for an app of make_app: all attrs set, at all
+    levels, as nested dict (File) and flat key/value list (CLI, Env)"""
+    cfg, kvs, pth = {}, [], ()
+    m = cfg
+    for level in range(depth):
+        for i, k in enumerate(names(n_attrs)):
+            m[k] = values[i % 5][1]
+            kvs.append((pth + (k,), values[i % 5][1]))
+        m = m.setdefault('nested', {})
+        pth += ('nested',)
+    return cfg, kvs
+
+
+def make_argv(kvs, keys='long', n_params=3):
+    """keys: long, short (abc) or prefix (ax_bx_c, for ax_bx_cx)"""
+    argv = []
+    for pth, v in kvs:
+        k = pth[-1]
+        if keys == 'short':
+            k = short(k)
+        elif keys == 'prefix':
+            k = k[:-1]
+        argv.append('%s=%s' % ('.'.join(pth[:-1] + (k,)), v))
+    argv.append('run')
+    params = names(n_params, 10000)
+    argv.extend(
+        ['%s=%s' % (p, values[i % 5][1]) for i, p in enumerate(params)]
+    )
+    return argv
+
+
+def make_environ(kvs, prefix, noise=10000):
+    env = dict([('NOISE_VAR_%s' % i, 'x' * 20) for i in range(noise)])
+    for pth, v in kvs:
+        env['%s_%s' % (prefix, '_'.join(pth))] = v
+    return env
+
+
+def make_file(cfg):
+    fd, fn = tempfile.mkstemp(suffix='.json')
+    with os.fdopen(fd, 'w') as fd:
+        fd.write(json.dumps(cfg))
+    return fn
+
+
+# ------------------------------------------------------------------- Scenarios
+def scenario(name, attrs=10, depth=1, actions=1, keys='long', provs='cli'):
+    return dict(
+        name=name,
+        attrs=attrs,
+        depth=depth,
+        actions=actions,
+        keys=keys,
+        provs=provs,
+    )
+
+
+def scenarios(quick):
+    r = []
+    for n in (10, 100) if quick else (10, 100, 1000, 10000):
+        r.append(scenario('flat_%s' % n, attrs=n))
+        r.append(scenario('flat_%s_short' % n, attrs=n, keys='short'))
+        r.append(scenario('flat_%s_prefix' % n, attrs=n, keys='prefix'))
+    for d in (1, 5) if quick else (1, 5, 20):
+        r.append(scenario('depth_%s' % d, depth=d))
+    for a in (10,) if quick else (10, 100, 1000):
+        r.append(scenario('actions_%s' % a, actions=a))
+    n = 100 if quick else 1000
+    r.append(scenario('env_%s' % n, attrs=n, provs='env'))
+    r.append(scenario('file_%s' % n, attrs=n, provs='file'))
+    r.append(scenario('mix_%s' % n, attrs=n, depth=3, provs='cli,env,file'))
+    return r
+
+
+def timeit(func, min_time=0.1, max_runs=50):
+    """best of the runs within min_time, in ms (at least 2 runs)"""
+    dt, t_end = [], time.time() + min_time
+    while len(dt) < min(2, max_runs) or (
+        time.time() < t_end and len(dt) < max_runs
+    ):
+        t0 = time.time()
+        func()
+        dt.append(time.time() - t0)
+    return min(dt) * 1000
+
+
+def calibration():
+    def work():
+        d = {}
+        for i in range(20000):
+            d['k%s' % i] = str(i).startswith('1')
+        return sorted(d)
+
+    return timeit(work, 0.5)
+
+
+def run(s):
+    """Measures the phases of a scenario, returns {phase: ms}"""
+    n, depth = s['attrs'], s['depth']
+    App = make_app(n, depth, s['actions'])
+    cfg, kvs = make_cfg(n, depth)
+    argv = make_argv(kvs, s['keys'])
+    prefix, env, fn = 'BENCH', {}, None
+    provs = s['provs'].split(',')
+    if 'env' in provs:
+        env = make_environ(kvs, prefix)
+    if 'file' in provs:
+        fn = make_file(cfg)
+
+    def providers():
+        r = []
+        if 'cli' in provs:
+            r.append(CLI(argv))
+        else:
+            r.append(CLI(['run']))
+        if 'env' in provs:
+            r.append(Env(prefix))
+        if 'file' in provs:
+            r.append(File(fn))
+        return r
+
+    environ, scan_cfg = dict(os.environ), dict(devapps.scan.CFG)
+    os.environ.update(env)
+    # the class scan cache we don't want to measure, the scan itself yes:
+    devapps.scan.CFG['enabled'] = False
+    try:
+        res = {}
+        apps = [make_app(n, depth, s['actions']) for i in range(3)]
+        res['cold'] = timeit(lambda: configure(apps.pop(), providers()), 0, 3)
+        res['pre_parse_cli'] = timeit(lambda: CLI.pre_parse_cli(argv))
+        res['compile'] = timeit(lambda: devapps.compile(App))
+        plan = devapps.compile(App)
+        attrs, shorts = plan.root.attrs, plan.root.shorts
+        d = CLI.pre_parse_cli(argv)
+        ctx = {'shorts': shorts, 'short_keys': plan.root.short_keys}
+        res['short_to_long'] = timeit(
+            lambda: short_to_long(None, d, attrs, ctx)
+        )
+        casts = [(v, values[i % 5][0]) for i, (_, v) in enumerate(kvs)]
+        res['cast'] = timeit(lambda: [cast(v, dflt) for v, dflt in casts])
+        f, params = App.do_run, names(3, 10000)
+        args = [(p, values[i % 5][1]) for i, p in enumerate(params)]
+        res['map_args'] = timeit(
+            lambda: map_args_to_func_sig(f, args, {}, map_from=1)
+        )
+
+        def walk():
+            p = [[p, p.cfg(), p.str_only] for p in providers()]
+            walk_attrs(plan.root, p, {})
+
+        plan.configure(providers())
+        res['walk_attrs'] = timeit(walk)
+        res['configure'] = timeit(lambda: configure(App, providers()))
+        return res
+    finally:
+        os.environ.clear()
+        os.environ.update(environ)
+        devapps.scan.CFG.update(scan_cfg)
+        if fn:
+            os.unlink(fn)
+
+
+# ------------------------------------------------------------------------ Main
+phases = [
+    'pre_parse_cli',
+    'short_to_long',
+    'compile',
+    'cast',
+    'map_args',
+    'walk_attrs',
+    'configure',
+    'cold',
+]
+
+
+def load_baselines():
+    if not os.path.exists(fn_baselines):
+        return {}
+    with open(fn_baselines) as fd:
+        return json.loads(fd.read())
+
+
+def main(argv):
+    quick, save = '-q' in argv, '--save' in argv
+    match = [a for a in argv if not a.startswith('-')]
+    base, results, regressions = load_baselines(), {}, []
+    cal = calibration()
+    scale = cal / base.get('_calibration', cal)
+    print(('%-20s' + ' %13s' * len(phases)) % tuple(['[ms]'] + phases))
+    for s in scenarios(quick):
+        if match and not [m for m in match if m in s['name']]:
+            continue
+        res = results[s['name']] = run(s)
+        print(('%-20s' + ' %13.3f' * len(phases)) % tuple(
+            [s['name']] + [res[p] for p in phases]
+        ))
+        b = base.get(s['name'], {})
+        for p in phases:
+            if p in b and res[p] > b[p] * scale * tolerance + slack:
+                regressions.append((s['name'], p, b[p] * scale, res[p]))
+    for r in regressions:
+        print('Regression: %s %s: %.3fms (scaled baseline) -> %.3fms' % r)
+    if save:
+        base.update(results)
+        base['_calibration'] = cal
+        with open(fn_baselines, 'w') as fd:
+            fd.write(json.dumps(base, indent=1, sort_keys=True))
+        print('Stored', fn_baselines)
+        return 0
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
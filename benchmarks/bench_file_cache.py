@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+"""
+configure with a big JSON File (cached, see devapps.read_cfg_file) against
+parsing the file: The cache hands out the parsed (read only) tree, so a warm
+configure must cost a fraction of a json.loads of the file - copying the
+values per configure (0.5s for 4MB) made it slower than no cache at all.
+
+    python benchmarks/bench_file_cache.py [mb] [max_ratio]
+
+Exits with 1 when configure takes more than max_ratio (default 0.2) times
+the json.loads of the file.
+"""
+from __future__ import print_function
+import json
+import os
+import sys
+import tempfile
+import time
+
+from devapps import configure, CLI, File
+
+
+class App:
+    name = 'x'
+    items = []
+    table = {}
+
+    def do_run(app):
+        return len(app.items) + len(app.table)
+
+
+def make_file(mb):
+    n = int(mb * 1e6) // 80
+    items = [{'id': i, 'tags': ['a', 'b'], 'w': i * 0.5} for i in range(n)]
+    table = dict([('k%s' % i, [i, str(i)]) for i in range(n)])
+    fd, fn = tempfile.mkstemp(suffix='.json')
+    with os.fdopen(fd, 'w') as fd:
+        fd.write(json.dumps({'name': 'y', 'items': items, 'table': table}))
+    return fn
+
+
+def best_of(func, n=5):
+    dt = []
+    for i in range(n):
+        t0 = time.time()
+        func()
+        dt.append(time.time() - t0)
+    return min(dt) * 1000
+
+
+def main(mb=4, max_ratio=0.2):
+    fn = make_file(mb)
+    try:
+        with open(fn, 'rb') as fd:
+            s = fd.read()
+        parse = best_of(lambda: json.loads(s.decode('utf-8')))
+
+        def run():
+            C, func = configure(App, (CLI([]), File(fn)))
+            return func(C())
+
+        run()  # fills the cache
+        dt = best_of(run)
+    finally:
+        os.unlink(fn)
+    print('file          %6.1f MB' % (len(s) / 1e6))
+    print('json.loads    %6.1f ms' % parse)
+    print('configure     %6.1f ms (max %s * json.loads)' % (dt, max_ratio))
+    return 1 if dt > parse * max_ratio else 0
+
+
+if __name__ == '__main__':
+    a = sys.argv[1:]
+    sys.exit(main(float(a[0]) if a else 4, float(a[1]) if a[1:] else 0.2))
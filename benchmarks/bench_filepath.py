@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""
+RSS with a big array parameter: mapped (filepath) vs. read (array).
+
+    python benchmarks/bench_filepath.py [MB]
+
+Every variant runs in its own process, configuring an app with the path of a
+raw file of MB (default 500) megabytes of doubles and summing 100 of
+its items (lookups) in do_run. Reported: the RSS at the start of do_run and
+the peak RSS at its end. Mapped pages touched by the lookups are clean page
+cache, counted in RSS (whole folios, on some file systems) but not allocated.
+"""
+from __future__ import print_function
+import os
+import sys
+import tempfile
+import subprocess as sp
+
+code = '''
+import sys, resource
+from array import array
+import devapps
+
+rss = lambda: resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+class App:
+    table = devapps.filepath('d') if sys.argv[2] == 'mapped' else array('d')
+
+    def do_run(app):
+        print(rss())
+        t = app.table
+        if sys.argv[2] == 'read':
+            with open(sys.argv[1], 'rb') as fd:
+                t = array('d', fd.read())
+        return sum([t[i] for i in range(0, len(t), len(t) // 100)])
+
+if sys.argv[2] == 'read':
+    argv = ['run']
+else:
+    argv = ['table=' + sys.argv[1], 'run']
+A, run = devapps.configure(App, devapps.CLI(argv))
+run(A())
+print(rss())
+'''
+
+
+def main(mb=500):
+    fd, fn = tempfile.mkstemp(suffix='.bin')
+    with os.fdopen(fd, 'wb') as fd:
+        block = b'\0' * (1 << 20)
+        for i in range(mb):
+            fd.write(block)
+    try:
+        for variant in ('mapped', 'read'):
+            res = sp.check_output([sys.executable, '-c', code, fn, variant])
+            start, peak = [float(r) for r in res.split()]
+            msg = '%-8s RSS at do_run %8.1f MB, peak %8.1f MB'
+            print(msg % (variant, start, peak))
+    finally:
+        os.unlink(fn)
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+"""
+Import time of the devapp entry point, on top of `import attr` (our only
+non stdlib dependency), best of n fresh interpreters.
+
+    python benchmarks/bench_import.py [n] [budget_ms]
+
+Exits with 1 when over budget (default: DEVAPPS_IMPORT_BUDGET_MS or 60).
+Which modules must not be imported eagerly tests/test_coldstart.py checks.
+"""
+from __future__ import print_function
+import os
+import sys
+import time
+import subprocess as sp
+
+
+def best_of(code, n=5):
+    dt = []
+    for i in range(n):
+        t0 = time.time()
+        sp.check_call([sys.executable, '-c', code])
+        dt.append(time.time() - t0)
+    return min(dt) * 1000
+
+
+def main(n=5, budget=None):
+    if budget is None:
+        budget = float(os.environ.get('DEVAPPS_IMPORT_BUDGET_MS', 60))
+    attr = best_of('import attr', n)
+    dt = best_of('import devapps.app', n) - attr
+    print('import attr        %6.1f ms' % attr)
+    print('devapps.app on top %6.1f ms (budget %s)' % (dt, budget))
+    return 1 if dt > budget else 0
+
+
+if __name__ == '__main__':
+    a = sys.argv[1:]
+    sys.exit(main(int(a[0]) if a else 5, float(a[1]) if a[1:] else None))
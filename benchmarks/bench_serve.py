@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""
+Wall time per invocation: `devapp <module> ...` vs. the thin client of a
+`devapp --serve <module>` server vs. launch (forked children of one process).
+
+    python benchmarks/bench_serve.py [runs]
+
+All run the tutorial calculator (tests/tutorial/calc.py) runs (default 50)
+times. devapp and client as separate processes - like shell pipelines do,
+launch one by one (jobs=1), to compare the cost of a run, not the cores.
+"""
+from __future__ import print_function
+import os
+import sys
+import time
+import tempfile
+import subprocess as sp
+
+here = os.path.dirname(os.path.abspath(__file__))
+tut = os.path.join(here, '..', 'tests', 'tutorial')
+src = os.path.join(here, '..', 'src')
+devapp = [sys.executable, '-c', 'from devapps.app import run; run()']
+
+
+class Quiet:
+    @classmethod
+    def info(cls, *a, **kw):
+        pass
+
+    debug = warn = error = info
+
+
+def per_run(cmd, runs):
+    t0 = time.time()
+    for i in range(runs):
+        sp.check_call(cmd, cwd=tut, stdout=sp.DEVNULL)
+    return (time.time() - t0) / runs * 1000
+
+
+def main(runs=50):
+    os.environ['PYTHONPATH'] = os.path.abspath(src)
+    sock = os.path.join(tempfile.mkdtemp(), 'calc.sock')
+    cmd = devapp + ['--serve', '--socket', sock, './calc.py']
+    srv = sp.Popen(cmd, cwd=tut)
+    try:
+        while not os.path.exists(sock):
+            time.sleep(0.05)
+        client = [sys.executable, '-S', os.path.join(src, 'devapps/serve.py')]
+        args = ['of=mul', '41', '2']
+        dt = per_run(devapp + ['./calc.py'] + args, runs)
+        print('devapp  %6.1f ms' % dt)
+        print('client  %6.1f ms' % per_run(client + [sock] + args, runs))
+        sys.path.insert(0, tut)
+        sys.path.insert(0, src)
+        from calc import Calc
+        from devapps.serve import launch
+
+        t0 = time.time()
+        for i, res, ex in launch(Calc, [args] * runs, jobs=1, log=Quiet):
+            assert res == 82, ex
+        print('launch  %6.1f ms' % ((time.time() - t0) / runs * 1000))
+    finally:
+        srv.kill()
+        srv.wait()
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -2,20 +2,20 @@ from __future__ import absolute_import, print_function
 from .version import __version__
 
 import time
-import string
 import sys
 import os
-import json
 
-from ast import literal_eval
-from appdirs import user_config_dir
+from bisect import bisect_left
 from functools import partial
 
 
 from .func_sigs import map_args_to_func_sig, repl_func_defaults
 from .func_sigs import flatten_dotted_arg_from_dict
 from .casting import funcname, cast, t_attr, t_funcs
-from .casting import is_cls, attr
+from .casting import is_cls, attr, by_value, filepath
+from .casting import parse_struct, too_long
+from .plan import compile, compiled, k_func, k_attr, k_val, k_type
+from .plan import k_inner
 
 
 from devapps import common
@@ -26,6 +26,7 @@ throw = common.throw
 is_str = common.is_str
 breakpoint = common.breakpoint
 from .common import set_log, info, debug, warn, error, get_structlogger
+from .common import cpu_count
 
 odict = dict
 if common.PY2:
@@ -45,6 +46,7 @@ class Provider(object):
     set_runner_func      = False
     allow_unknown_attrs  = True
     show_help            = None
+    help_path            = None
     # fmt: on
 
     def get_inner(cli, d, path, attrs, cfg):
@@ -65,11 +67,13 @@ def shorten(k):
     return r, r + parts[-1][1:]
 
 
-def to_shorts(longs, shorten=shorten):
+def to_shorts(longs, shorten=shorten, collisions=None):
     """build a dict of short forms pointing to their original forms
 
     Collisions: We'll complain for foo_bar_baz and foo_baz_baz attrs
     and don't try to be smart here. Thats why we need the 'have' list.
+    With a collisions dict given we don't complain but note them there
+    (short form -> the attrs), for short_to_long to complain when used.
     """
     m = odict()
     have = set()
@@ -77,8 +81,9 @@ def to_shorts(longs, shorten=shorten):
         m[k] = k  # allowed match stsarts with also ok
         sh, sh_ending = shorten(k)
         if sh in have:
-            # thats ok, colliding shorts
-            m.pop(sh)
+            # thats ok, colliding shorts (but keep longs, e.g. run vs r_u_n):
+            if m.get(sh) != sh:
+                m.pop(sh, None)
         else:
             m[sh] = k
             have.add(sh)
@@ -87,21 +92,39 @@ def to_shorts(longs, shorten=shorten):
                 continue
         if sh_ending in have:
             # developer has to rename the attribute if he wants the feature
-            throw(
-                Exc.cannot_build_unique_short_form,
-                key=k,
-                colliding=sh_ending,
-                have=have,
-            )
+            if collisions is None:
+                throw(
+                    Exc.cannot_build_unique_short_form,
+                    key=k,
+                    colliding=sh_ending,
+                    have=have,
+                )
+            c = collisions.setdefault(sh_ending, [])
+            if m.get(sh_ending, sh_ending) != sh_ending:
+                c.append(m.pop(sh_ending))
+            c.append(k)
+            continue
         m[sh_ending] = k
         have.add(sh_ending)
     return m
 
 
+def prefixed(keys, k):
+    """The keys starting with k - keys sorted: O(log n)"""
+    i = bisect_left(keys, k)
+    j = bisect_left(keys, k[:-1] + chr(ord(k[-1]) + 1), i)
+    return keys[i:j]
+
+
 def short_to_long(provider, d, attrs, ctx):
     shorts = ctx.get('shorts')
-    if not shorts:
-        shorts = ctx['shorts'] = to_shorts([l[0] for l in attrs if l])
+    if shorts is None:
+        c = ctx['collisions'] = {}
+        longs = [l[0] for l in attrs if l]
+        shorts = ctx['shorts'] = to_shorts(longs, collisions=c)
+    collisions = ctx.get('collisions')
+    # sorted, for the prefix matching. Kept with the class plan:
+    keys = ctx.get('short_keys') or sorted(shorts)
     nd = odict()
     orig_shorts = {}
     for k in d:
@@ -112,16 +135,19 @@ def short_to_long(provider, d, attrs, ctx):
             nd[k] = 'is_set'
             continue
 
-        try:
-            # nd[shorts[k]] = d[k]
-            h = shorts[k]
-        except:
-            h = [p for p in shorts if p.startswith(k)]
+        h = shorts.get(k)
+        if h is None and collisions and k in collisions:
+            throw(
+                Exc.cannot_build_unique_short_form,
+                key=k,
+                colliding=collisions[k],
+            )
+        if h is None:
+            h = prefixed(keys, k)
             if len(h) > 1:
-                throw(Exc.non_unique, key=k, have=h)
+                throw(Exc.non_unique, key=k, have=list(h))
             if len(h) == 1:
                 h = h[0]
-                # nd[shorts[h[0]]] = d[k]
             else:
                 h = k
         nd[h] = d[k]
@@ -226,9 +252,19 @@ class CLI(Provider):
     #        throw(Exc.not_a_switch, s)
 
     def cfg(cli):
-        hs = cli.argvd.pop(cli.help_switch, None)
-        if hs is not None:
-            cli.show_help = hs
+        sw = cli.help_switch
+        chars = set(sw[1:] + 'cu')
+        for k in [k for k in cli.argvd if k.startswith(sw)]:
+            if not set(k[1:]) <= chars:
+                continue
+            # -h, -hh (last arg: {'-h': 'hh'}) or -hh inner.deep:
+            v, level, path = cli.argvd.pop(k), k[1:], None
+            if v != 'is_set':
+                if k == sw and set(v) <= chars:
+                    level = v
+                else:
+                    path = v
+            cli.show_help, cli.help_path = level, path
         return cli.argvd
 
 
@@ -238,35 +274,246 @@ class CLI(Provider):
 def conv_str(v):
     if v and v[0] in ('[', '(', '{'):
         try:
-            return literal_eval(v)
-        except:
+            return parse_struct(v)
+        except Exception as ex:
+            if too_long(ex):
+                raise
             return v
     return v
 
 
+class EnvTrie(object):
+    """The environ vars below a prefix, as trie over their name segments
+    (split at '_'): APP_inner_deep_b_x -> inner, deep, b, x.
+    Built in one pass, the values are converted (conv_str) on first access.
+    Offers the dict api we need in walk_attrs, keys are the (rest of the) var
+    names, like in a dict of the vars filtered by prefix.
+    """
+
+    __slots__ = ('val', 'raw', 'sub')
+
+    def __init__(t):
+        t.val, t.raw, t.sub = nil, True, odict()
+
+    @classmethod
+    def build(cls, env, prefix):
+        root, l = cls(), len(prefix)
+        # keys only, os.environ decodes on access:
+        for k in env:
+            if k.startswith(prefix):
+                t = root
+                for s in k[l:].split('_'):
+                    n = t.sub.get(s)
+                    if n is None:
+                        n = t.sub[s] = cls()
+                    t = n
+                t.val = env[k]
+        return root
+
+    def node(t, k):
+        """The sub trie of the vars starting with k + '_'"""
+        for s in k.split('_'):
+            t = t.sub.get(s)
+            if t is None:
+                return
+        return t
+
+    def value(t):
+        if not t.raw or t.val is nil:
+            return t.val
+        v = conv_str(t.val)
+        # structured ones converted per access - apps may change theirs:
+        if not isinstance(v, (list, dict)):
+            t.val, t.raw = v, False
+        return v
+
+    def get(t, k, dflt=None):
+        n = t.node(k) if is_str(k) else None
+        v = nil if n is None else n.value()
+        return dflt if v is nil else v
+
+    def pop(t, k, *dflt):
+        v = t.get(k, nil)
+        if v is nil:
+            if dflt:
+                return dflt[0]
+            raise KeyError(k)
+        t.node(k).val = nil
+        return v
+
+    def __getitem__(t, k):
+        v = t.get(k, nil)
+        if v is nil:
+            raise KeyError(k)
+        return v
+
+    def __contains__(t, k):
+        return t.get(k, nil) is not nil
+
+    def items(t, pre=''):
+        for s, n in t.sub.items():
+            k = pre + s
+            if n.val is not nil:
+                yield k, n.value()
+            for kv in n.items(k + '_'):
+                yield kv
+
+    def keys(t):
+        return [k for k, _ in t.items()]
+
+    def __iter__(t):
+        return iter(t.keys())
+
+    def __len__(t):
+        return len(t.keys())
+
+    def __bool__(t):
+        for n in t.sub.values():
+            if n.val is not nil or n:
+                return True
+        return False
+
+    __nonzero__ = __bool__
+
+
 @attr.s
 class Env(Provider):
     prefix = attr.ib(default='', type=str, converter=lambda p: (p + '_'))
     str_only = attr.ib(True)
 
     def build_env_dict(env):
-        e = os.environ
-        l = len(env.prefix)
-        return odict(
-            [(k[l:], conv_str(e[k])) for k in e if k.startswith(env.prefix)]
-        )
+        return EnvTrie.build(os.environ, env.prefix)
 
     def cfg(env):
         return env.build_env_dict()
 
     def get_inner(env, d, path, attrs, cfg):
-        p = path[-1] + '_'
-        l = len(p)
-        d = odict([(k[l:], v) for k, v in d.items() if k.startswith(p)])
-        return d
+        # one step down in the trie, instead of filtering all vars by prefix:
+        return d.node(path[-1])
 
 
 # ------------------------------------------------------------------------ File
+# The parsers, imported on first use:
+def load_json(s):
+    import json
+
+    return json.loads(s.decode('utf-8'))
+
+
+def load_toml(s):
+    try:
+        import tomllib as toml  # py >= 3.11
+    except ImportError:
+        import toml
+
+    return toml.loads(s.decode('utf-8'))
+
+
+def load_yaml(s):
+    import yaml
+
+    return yaml.safe_load(s) or {}
+
+
+def load_ini(s):
+    """Sections into dicts, dotted section names ([inner.deep]) nested.
+    [DEFAULT] holds the top level values - not inherited by the sections.
+    Values are strings, we cast them (File.str_only)"""
+    if common.PY2:
+        from ConfigParser import RawConfigParser
+        from StringIO import StringIO
+    else:
+        from configparser import RawConfigParser
+
+    p, s = RawConfigParser(), s.decode('utf-8')
+    p.optionxform = str  # case sensitive, like the attrs
+    if common.PY2:
+        p.readfp(StringIO(s))
+    else:
+        p.read_string(s)
+    r = odict(p.defaults())
+    for sect in p.sections():
+        m = r
+        for k in sect.split('.'):
+            m = m.setdefault(k, odict())
+        # own keys only, p.items(sect) would add the DEFAULT ones:
+        own = p._sections[sect]
+        m.update([(k, v) for k, v in own.items() if k != '__name__'])
+    return r
+
+
+# fmt: off
+loaders = {
+    'json': load_json,
+    'toml': load_toml,
+    'yaml': load_yaml,
+    'yml' : load_yaml,
+    'ini' : load_ini,
+    'cfg' : load_ini,
+}
+# fmt: on
+
+# parsed files, by (path, filetype). Valid while (inode, mtime, size) match:
+file_cache = {}
+
+
+def read_only(*a, **kw):
+    raise TypeError('Read only config value (shared), change a copy of it')
+
+
+class frozen_dict(dict):
+    """The dicts of cached files: Handed out to all apps, w/o copies"""
+
+    __setitem__ = __delitem__ = __ior__ = read_only
+    clear = pop = popitem = setdefault = update = read_only
+
+    def __reduce__(d):
+        # copy, deepcopy and pickle deliver plain (changeable) ones:
+        return dict, (dict(d),)
+
+
+class frozen_list(list):
+    """The lists of cached files, see frozen_dict"""
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = read_only
+    append = extend = insert = pop = remove = clear = read_only
+    sort = reverse = read_only
+
+    def __reduce__(l):
+        return list, (list(l),)
+
+
+def freeze(o):
+    """o with its dicts and lists (recursively) as read only ones"""
+    if isinstance(o, dict):
+        return frozen_dict([(k, freeze(v)) for k, v in o.items()])
+    if isinstance(o, list):
+        return frozen_list([freeze(v) for v in o])
+    return o
+
+
+def read_cfg_file(fn, filetype):
+    """The parsed content of fn - shared, read only (see freeze)"""
+    st = os.stat(fn)
+    stamp = (st.st_ino, getattr(st, 'st_mtime_ns', st.st_mtime), st.st_size)
+    have = file_cache.get((fn, filetype))
+    if have and have[0] == stamp:
+        return have[1]
+    # one read, no line splitting or decoding by the file object:
+    with open(fn, 'rb') as fd:
+        s = fd.read()
+    cfg = freeze(loaders[filetype](s))
+    file_cache[(fn, filetype)] = (stamp, cfg)
+    return cfg
+
+
+def config_dir(have=[]):
+    """user_config_dir(), looked up once"""
+    if not have:
+        from appdirs import user_config_dir
+
+        have.append(user_config_dir())
+    return have[0]
 
 
 @attr.s
@@ -274,6 +521,7 @@ class File(Provider):
     filename = attr.ib(
         default='', type=str, validator=lambda self, attribs, v: self.load(v)
     )
+    # for app classes given, or filenames with an extension not in loaders:
     filetype = attr.ib(default='json')
     ignore_missing = attr.ib(default=None)
     _cfg = attr.ib(default={})
@@ -285,21 +533,24 @@ class File(Provider):
         if not fn:
             return
         die = False
+        ft = file.filetype
         if is_str(fn):
             die = True
+            ext = fn.rsplit('.', 1)[-1].lower()
+            ft = ext if ext in loaders else ft
         else:
             # app class given:
-            fn = fn.__name__ + '.' + file.filetype
+            fn = fn.__name__ + '.' + ft
         if file.ignore_missing != None:
             die = not file.ignore_missing
         try:
             if not os.path.exists(fn):
-                fn = os.path.join(user_config_dir(), fn)
+                fn = os.path.join(config_dir(), fn)
             fn = os.path.abspath(fn)
-            file.filename = fn
-            with open(fn) as fd:
-                s = fd.read()
-            file._cfg = json.loads(s)
+            file.filename, file.filetype = fn, ft
+            file._cfg = read_cfg_file(fn, ft)
+            # ini has strings only:
+            file.str_only = loaders[ft] == load_ini
         except Exception as ex:
             msg = Exc.file_not_found
             args = odict(exc=ex, fn=fn)
@@ -307,6 +558,15 @@ class File(Provider):
                 throw(msg, **args)
             debug(msg, **args)
 
+    def watch(file, app, callback=None, interval=1.0, poll=False):
+        """Applies changes of the file to the configured app (instance).
+        callback(app, changed key paths), called from the watcher thread.
+        Returns the started watch.Watcher (stop(), or use it with `with`)
+        """
+        from .watch import Watcher
+
+        return Watcher(file, app, callback, interval, poll).start()
+
 
 # --------------------------------------------------------- Programmed Defaults
 
@@ -342,27 +602,18 @@ def was_a_dotted_positional_arg(cfg_val, key, prov):
     return True
 
 
-def walk_attrs(cls, providers, ctx):
+def walk_attrs(cp, providers, ctx):
     """
-    here we burn startup time - recursively scanning all(!) cls attrs of the app.
-    have to see if we should cache the scan results.
+    Resolving the provider values against the class plan cp (see plan.py),
+    recursively. The introspection of the classes is done already, at compile.
 
+    Returns the configured (derived) class and the function to run.
     """
-    path = cls._path
-
-    # first we build all infos about the attrs within our class:
-    # (value, type, isit a (do) function):
-    def nfo(cls, k):
-        v = getattr(cls, k)
-        t = type(v)
-        ft = t in t_funcs
-        if ft:
-            if not k.startswith('do_'):
-                return
-            k = k[3:]
-        return k, v, t, ft
+    path = cp.path
 
-    attrs = [nfo(cls, k) for k in dir(cls) if not k.startswith('_')]
+    # the infos about the attrs within our class:
+    # (name, value, type, isit a (do) function, kind, caster):
+    attrs = cp.attrs
 
     # now get fetch config from all providers regrding this class nesting
     # level:
@@ -378,14 +629,18 @@ def walk_attrs(cls, providers, ctx):
         )
     else:
         # first level:
-        h = [l for l in [p[0].show_help for p in providers] if l is not None]
+        h = [p[0] for p in providers if p[0].show_help is not None]
         if h:
-            ctx['show_help'] = h[0]
+            ctx['show_help'] = h[0].show_help
+            ctx['help_path'] = h[0].help_path
         ctx['funcs'] = {}
+        # requested ones and those only given args (dotted keys):
+        ctx['actions'], ctx['dotted_actions'] = [], []
     sh_help = ctx.get('show_help')
 
-    # now the shorts matching:
-    ctx['shorts'] = None
+    # now the shorts matching (short_to_long complains about collisions):
+    ctx['shorts'], ctx['short_keys'] = cp.shorts, cp.short_keys
+    ctx['collisions'] = cp.collisions
     # if path == ('inner', 'deep'):
     #    breakpoint()
     providers = [
@@ -395,16 +650,15 @@ def walk_attrs(cls, providers, ctx):
         for p in providers
     ]
 
-    func, have_attrs = None, set()
+    have_attrs = set()
+    # what we need to derive the configured class (see ClassPlan.derive):
+    provs, values, funcs = [], {}, {}
 
     # now the replacement run over all attrs - and the casting:
     # if the value is a nested class we recurse:
     for l in attrs:
-        if not l:
-            continue
         # key value, type, is function_type of the original class:
-        k, v, t, ft = l
-        v_orig = v
+        k, v, t, ft, kind, caster = l
 
         have_attrs.add(k)
         # if k == 'b_dflt_False':
@@ -420,88 +674,82 @@ def walk_attrs(cls, providers, ctx):
                 from_prov = p[0].__class__.__name__
                 break
 
-        if t != type:
-            # an instance. Like: some_bool=True
-            # or a function type?
-            if ft:
-                if have_cfg:
-                    if isinstance(cfg_val, dict):
-                        _ = p[0].__class__.__name__
-                        # uh-oh: A positionally given dotted arg collides with
-                        # a do function name?
-                        if was_a_dotted_positional_arg(cfg_val, k, p):
-                            have_attrs.remove(k)
-                            have_cfg = False
-                            continue
-                        repl_func_defaults(func=v, dflts=cfg_val, provider=_)
-                    # (else we just have 'is_set' if its the function req. to
-                    # run - then we do not change defaults)
-                    if p[0].set_runner_func:
-                        # might be nested in cli dict, i.e. earlier attrs still to come
-                        func = [path, v]
-                continue
+        if kind == k_func:
+            if have_cfg:
+                if isinstance(cfg_val, dict):
+                    _ = p[0].__class__.__name__
+                    # uh-oh: A positionally given dotted arg collides with
+                    # a do function name?
+                    if was_a_dotted_positional_arg(cfg_val, k, p):
+                        have_attrs.remove(k)
+                        have_cfg = False
+                        continue
+                    v = repl_func_defaults(func=v, dflts=cfg_val, provider=_)
+                    funcs['do_' + k] = v
+                # (else we just have 'is_set' if its the function req. to
+                # run - then we do not change defaults)
+                if p[0].set_runner_func:
+                    # might be nested in cli dict, i.e. earlier attrs still to come
+                    a = 'actions' if cfg_val == 'is_set' else 'dotted_actions'
+                    ctx[a].append((path, k, v))
+            continue
 
-            if t == t_attr:
-                if have_cfg:
-                    typ = v.type or type(v._default)
-                    v._default = cast(cfg_val, typ) if str_only else cfg_val
-                    # already an attr.ib:
+        if kind == k_attr:
+            # already an attr.ib:
+            if have_cfg:
+                # typed arrays we build also from lists, dicts by schema:
+                by_val = by_value(v._default)
+                v = caster(cfg_val) if str_only or by_val else cfg_val
             else:
-                if have_cfg:
-                    v = cast(cfg_val, t) if str_only else cfg_val
-                v = attr.ib(v)
-        else:
+                v = v._default
+        elif kind == k_val:
+            # an instance. Like: some_bool=True
+            if have_cfg:
+                by_val = by_value(v)
+                v = caster(cfg_val) if str_only or by_val else cfg_val
+        elif kind == k_type:
             # a typ - no value. E.g. some_bool = bool
-            caster = cast.get(v)
-            if caster:
-                if not have_cfg:
-                    if sh_help:
-                        # values not required then:
-                        cfg_val = v.__name__
-                        caster = lambda s, v, ctx: 'req:<%s>' % s
-                    else:
-                        throw(Exc.require_value, key=k)
-                v = attr.ib(caster(cfg_val, v, ctx) if str_only else cfg_val)
-            else:
-                v._path = path + (k,)
-                v, inner_func = walk_attrs(v, providers, ctx)
-                if inner_func and func:
-                    throw(
-                        Exc.double_func_call,
-                        func1=funcname(func1),
-                        func2=funcname(inner_func),
-                    )
-                if not func and inner_func:
-                    func = inner_func
-
-                # v = attr.ib(factory=lambda cls=v: cls())
-                v = attr.ib(factory=lambda cls=v: cls())
-
-        v.metadata['orig'] = v_orig
-        v.metadata['provider'] = from_prov
-        setattr(cls, k, v)
+            if not have_cfg:
+                if sh_help:
+                    # values not required then:
+                    cfg_val = v.__name__
+                    caster = lambda s, v, ctx: 'req:<%s>' % s
+                else:
+                    throw(Exc.require_value, key=k)
+            by_val = by_value(v)
+            v = caster(cfg_val, v, ctx) if str_only or by_val else cfg_val
+        else:
+            v = walk_attrs(caster, providers, ctx)[0]
+
+        provs.append(from_prov)
+        values[k] = v
+
+    derive = lambda: cp.derive(tuple(provs), values, funcs)
 
     for p in providers:
         # cli is a provider which sets the runner func:
-        p[1].pop('_orig_shorts_', 0)
+        if p[0].allow_short_keys:
+            p[1].pop('_orig_shorts_', 0)
         if not path:
             # first level:
             h = ctx.get('show_help')
             if h is not None:
-                return (attr.s(cls), ((), (show_help, (), {'level': h})))
+                kw = {'level': h, 'path': ctx.get('help_path')}
+                return (derive(), ((), (show_help, (), kw)))
 
             if p[0].set_runner_func:
-                if not func:
-                    dflt_func = getattr(cls, 'do_run', None)
+                # args for a dependency do not request it:
+                actions = ctx['actions'] or ctx['dotted_actions']
+                if not actions:
+                    dflt_func = funcs.get('do_run')
+                    dflt_func = dflt_func or getattr(cp.cls, 'do_run', None)
                     if not dflt_func:
                         throw(Exc.cannot_determine_function)
-                    func = [(), dflt_func]
+                    actions = [((), 'run', dflt_func)]
                 params = [
                     (k, v) for k, v in p[1].items() if not k in have_attrs
                 ]
-                path, func = func
-                args = map_args_to_func_sig(func, params, map_from=1, ctx=ctx)
-                return attr.s(cls), (path, (func,) + args)
+                return derive(), action_plan(cp, actions, params, ctx)
 
         # now find unknown kvs at deeper levels:
         if not p[0].allow_unknown_attrs:
@@ -509,13 +757,169 @@ def walk_attrs(cls, providers, ctx):
             if unknown:
                 throw(Exc.unmatched, unknown=unknown)
 
-    return attr.s(cls), func
+    return derive(), None
+
+
+def needs(*actions):
+    """Decorator for do_ functions: They run after these actions (names,
+    dotted from the root class or within the function's class).
+    Their results are passed as keyword args, when in the signature
+    (dots as underscores)."""
+
+    def deco(f):
+        f._needs_ = actions
+        return f
+
+    return deco
+
+
+def find_action(cp, path, name):
+    """(path, name, function) of action name, relative to path or the root"""
+    for pth in path, ():
+        c, n = cp, pth + tuple(name.split('.'))
+        for k in n[:-1]:
+            l = [l for l in c.attrs if l[0] == k and l[4] == k_inner]
+            c = l[0][5] if l else None
+            if c is None:
+                break
+        if c is None:
+            continue
+        l = [l for l in c.attrs if l[0] == n[-1] and l[4] == k_func]
+        if l:
+            return n[:-1], n[-1], l[0][1]
+    throw(Exc.unmatched, action=name, path='.'.join(path))
+
+
+def action_graph(cp, actions):
+    """The requested actions and their dependencies, ordered such that
+    dependencies come first: [(dotted name, (path, name, needs)), ..]"""
+    r, seen = [], {}
+
+    def add(path, k, f, stack):
+        n = '.'.join(path + (k,))
+        if n in stack:
+            throw(Exc.cyclic_dependency, actions=stack[stack.index(n) :])
+        if n in seen:
+            return n
+        deps = [
+            add(*find_action(cp, path, d) + (stack + [n],))
+            for d in getattr(f, '_needs_', ())
+        ]
+        seen[n] = 1
+        r.append((n, (path, k, deps)))
+        return n
+
+    req = [add(path, k, f, []) for path, k, f in actions]
+    return req, r
+
+
+def action_plan(cp, actions, params, ctx):
+    """The function to run, with args - for several actions or ones with
+    dependencies run_actions"""
+    if len(actions) == 1 and not getattr(actions[0][2], '_needs_', None):
+        path, k, func = actions[0]
+        args = map_args_to_func_sig(func, params, map_from=1, ctx=ctx)
+        return path, (func,) + args
+    if len(actions) > 1 and params:
+        throw(Exc.args_of_several_actions, args=[p[0] for p in params])
+    req, graph = action_graph(cp, actions)
+    args = {}
+    if params:
+        # the dependency results come as keywords, so positionals we map:
+        f, deps = actions[0][2], dict(graph)[req[0]][2]
+        params = named_args(f, params, [d.replace('.', '_') for d in deps])
+        c = dict(ctx, req_args_complete=False)
+        args[req[0]] = map_args_to_func_sig(f, params, c, 1, False)
+    return (), (run_actions, (req, graph, args), {})
+
+
+def named_args(f, params, skip):
+    """params, the positional ones (value is_set) as keywords, named by the
+    free positional params of f, in order - but those in skip"""
+    from .func_sigs import binding
+
+    given = [k for k, v in params if v != 'is_set']
+    free = [n for n in binding(f, 1).pos_params if not n in skip + given]
+    r, extra = [], []
+    for k, v in params:
+        if v == 'is_set':
+            if not free:
+                extra.append(k)
+                continue
+            k, v = free.pop(0), k
+        r.append((k, v))
+    if extra:
+        throw(Exc.unmatched, unknown=extra)
+    return r
+
+
+def accepts(f, name):
+    """Has f (bound: but self) a param name or **kw? (binding is cached)"""
+    from .func_sigs import binding
+
+    func = getattr(f, '__func__', f)
+    skip = 0 if func is f else 1
+    p = binding(func, skip).sig_dict
+    if name in p and name not in list(p)[:skip]:
+        return True
+    return any([a.kind == a.VAR_KEYWORD for a in p.values()])
 
 
-def show_help(app, level=None, h=None):
+def run_actions(app, req, graph, args, jobs=None):
+    """Runs the actions of the graph, each once dependencies are done,
+    independent ones concurrently, in threads. Returns the result of the
+    requested action, for several a dict of their results, by name.
+    jobs: threads at most, default as the executor's (cpus + 4, max 32).
+    Without concurrent.futures (py2) the actions run one after another."""
+    try:
+        from concurrent.futures import ThreadPoolExecutor
+        from concurrent.futures import wait, FIRST_COMPLETED
+    except ImportError:
+        ThreadPoolExecutor = None
+
+    todo, objs = dict(graph), {}
+    for n, (path, k, deps) in graph:
+        objs[n] = getattr(inner(app, *path), 'do_' + k)
+
+    def call(n, deps):
+        f, (a, kw) = objs[n], args.get(n, ((), {}))
+        kw = dict(kw)
+        for d in deps:
+            p = d.replace('.', '_')
+            if accepts(f, p):
+                kw[p] = res[d]
+        r = f(*a, **kw)
+        if is_async(r):
+            from .aio import run
+
+            r = run(r)
+        return r
+
+    res = {}
+    if ThreadPoolExecutor is None:
+        # graph is in dependency order:
+        for n, (path, k, deps) in graph:
+            res[n] = call(n, deps)
+    else:
+        jobs = min(len(graph), jobs or min(32, cpu_count() + 4))
+        running = {}
+        with ThreadPoolExecutor(jobs) as ex:
+            while todo or running:
+                for n, (path, k, deps) in list(todo.items()):
+                    if all([d in res for d in deps]):
+                        running[ex.submit(call, n, deps)] = n
+                        del todo[n]
+                for f in wait(running, return_when=FIRST_COMPLETED)[0]:
+                    res[running.pop(f)] = f.result()
+    if len(req) == 1:
+        return res[req[0]]
+    return dict([(n, res[n]) for n in req])
+
+
+def show_help(app, level=None, h=None, path=None):
     from .help import render_help
 
-    return render_help(app, level, h)
+    return render_help(app, level, h, path)
 
 
 def inner(app, *pth):
@@ -537,12 +941,32 @@ def err_log_wrapped(func, log, app):
         throw(ex.__class__.__name__, msg=msg)
 
 
+def is_async(r):
+    """Coroutine (awaitable) or async generator"""
+    return hasattr(r, '__await__') or hasattr(r, '__anext__')
+
+
 def get_func(pth, func_with_args, log_err, log, app, *a, **kw):
     obj = inner(app, *pth)
     func, args, kwg = func_with_args
     args += a
     kwg.update(kw)
-    return func(obj, *args, **kwg)
+    res = func(obj, *args, **kwg)
+    if is_async(res):
+        from .aio import run
+
+        return run(res)
+    return res
+
+
+def read_providers(providers):
+    """[[provider, cfg, str_only], ..] - async cfg()s awaited concurrently"""
+    cfgs = [p.cfg() for p in providers]
+    if any([is_async(c) for c in cfgs]):
+        from .aio import run_all
+
+        cfgs = run_all(cfgs)
+    return [[p, c, p.str_only] for p, c in zip(providers, cfgs)]
 
 
 def root(obj):
@@ -564,22 +988,45 @@ def as_dict(obj):
 def configure(
     App, providers=None, req_args_complete=False, log_err=False, log=None
 ):
+    """Configures the App class tree with the values of the providers.
+    Returns the configured class (derived from App, which stays as is) and the
+    function to run, if any.
+
+    The introspection of the class tree is done once per process (see
+    plan.compiled) and so are the generated classes, per provider shape.
+    """
     if common.PY2:
         recursive_to_new_style(App)
 
+    return compiled(App).configure(
+        providers,
+        req_args_complete=req_args_complete,
+        log_err=log_err,
+        log=log,
+    )
+
+
+def configure_plan(
+    plan, providers=None, req_args_complete=False, log_err=False, log=None
+):
     set_log(log)
     if not providers:
         # take reasonable defaults
+        App = plan.App
         n = App.__name__
         providers = (cli_prov(App), Env(n), File(App))
     if not isinstance(providers, (tuple, list)):
         providers = [providers]
-    App._path = ()
+    provs = read_providers(providers)
+    return resolve(plan, provs, req_args_complete, log_err, log)
+
+
+def resolve(plan, provs, req_args_complete, log_err, log):
+    """configure, with the configs of the providers read already:
+    provs: [[provider, cfg, str_only], ...]"""
     ctx = {}
     ctx['req_args_complete'] = req_args_complete
-    App, pth_func_with_args = walk_attrs(
-        App, [[p, p.cfg(), p.str_only] for p in providers], ctx
-    )
+    App, pth_func_with_args = walk_attrs(plan.root, provs, ctx)
     # pdt(t0)
     if pth_func_with_args:
         pth, func_with_args = pth_func_with_args
@@ -587,3 +1034,36 @@ def configure(
     else:
         func = None
     return App, func
+
+
+def configure_many(
+    App,
+    argv_list,
+    providers=None,
+    req_args_complete=False,
+    log_err=False,
+    log=None,
+):
+    """Configures App for every argv (list of args) in argv_list.
+    Returns a list of (app, run): the configured app instance and the function
+    to run on it (w/o args), if any.
+
+    The class tree is introspected once, the providers (default: Env and File
+    of the App) are read once, their values shared by all items. Only the CLI
+    is per argv.
+    """
+    if common.PY2:
+        recursive_to_new_style(App)
+    set_log(log)
+    plan = compiled(App)
+    if providers is None:
+        providers = (Env(App.__name__), File(App))
+    shared = read_providers(providers)
+    r = []
+    for argv in argv_list:
+        cli = cli_prov(App, argv)
+        provs = [[cli, cli.cfg(), cli.str_only]] + shared
+        C, func = resolve(plan, provs, req_args_complete, log_err, log)
+        app = C()
+        r.append((app, partial(func, app) if func else None))
+    return r
@@ -0,0 +1,101 @@
+"""
+Async actions and providers (py >= 3.6), imported only when we meet one.
+
+    class App:
+        async def do_fetch(app, url): ...
+
+The function configure returns runs coroutines on an event loop of ours
+(one per process, reused - in other threads a new one per run), async
+generators it collects into lists. Called within a running loop it returns
+an awaitable for that, for the caller to await - the app decorator, which
+prints the result, blocks for it then (on a loop in a thread).
+
+Providers with an async cfg() are awaited concurrently, at configure time.
+"""
+from __future__ import absolute_import
+import asyncio
+import os
+import threading
+
+loops = {}
+
+
+def loop():
+    """Our event loop for the main thread (a new one in forked children)"""
+    l = loops.get(os.getpid())
+    if l is None or l.is_closed():
+        loops.clear()
+        l = loops[os.getpid()] = asyncio.new_event_loop()
+    return l
+
+
+def running():
+    """Called within a running event loop (of this thread)?"""
+    # py3.6 has no get_running_loop (and no running loop without asyncio):
+    get = getattr(asyncio, 'get_running_loop', None)
+    if get is None:
+        return asyncio._get_running_loop() is not None
+    try:
+        get()
+    except RuntimeError:
+        return False
+    return True
+
+
+async def collect(agen):
+    return [i async for i in agen]
+
+
+def awaitable(aw):
+    return collect(aw) if hasattr(aw, '__anext__') else aw
+
+
+def run(aw):
+    """The result of awaitable aw, async generator: the list of its items"""
+    if running():
+        return awaitable(aw)
+    return wait(lambda: awaitable(aw))
+
+
+def run_all(items):
+    """items with the awaitables among them replaced by their results,
+    awaited concurrently - blocking, also within a running loop"""
+    ix = [i for i, v in enumerate(items) if hasattr(v, '__await__')]
+
+    async def gather():
+        return await asyncio.gather(*[items[i] for i in ix])
+
+    # configure is sync, a running loop of the caller is blocked then:
+    res = wait(gather, thread=running())
+    items = list(items)
+    for i, v in zip(ix, res):
+        items[i] = v
+    return items
+
+
+def wait(coro_func, thread=False):
+    """Runs coro_func() to completion: On our loop in the main thread, else
+    on a new one - in a new thread if requested"""
+    main = threading.current_thread() is threading.main_thread()
+    if main and not thread:
+        return loop().run_until_complete(coro_func())
+    r = []
+
+    def target():
+        l = asyncio.new_event_loop()
+        try:
+            r.append((l.run_until_complete(coro_func()), None))
+        except Exception as ex:
+            r.append((None, ex))
+        finally:
+            l.close()
+
+    if not thread:
+        target()
+    else:
+        t = threading.Thread(target=target)
+        t.start()
+        t.join()
+    if r[0][1] is not None:
+        raise r[0][1]
+    return r[0][0]
@@ -1,7 +1,6 @@
 from __future__ import absolute_import, print_function
 import sys, os, traceback
 from .casting import attr, is_str, is_cls
-from .help import render_help
 from .common import (
     get_lazy_log,
     pdt,
@@ -13,7 +12,7 @@ from .common import (
     error,
     exception,
 )
-from devapps import common, root, parent, as_dict
+from devapps import common, root, parent, as_dict, is_async
 from devapps import configure, CLI, Env, File
 
 breakpoint = common.breakpoint
@@ -43,6 +42,54 @@ def set_logger(ac, attr, val):
         ac.logger = get_lazy_log('error', log_cfg(ac))
 
 
+def load_app_class(module_name, class_name):
+    """The App class, by module (or file) name and class name - or the one
+    class in the module, then the class_name is the first app argument,
+    argv_offs -1"""
+    mod = None
+    mn = module_name
+    for i in range(2):
+        try:
+            mod = __import__(mn)
+            break
+        except:
+            if mn.endswith('.py'):
+                mn = os.path.abspath(mn)
+                sys.path.insert(0, os.path.dirname(mn))
+                mn = mn.rsplit('/', 1)[1][:-3]
+    if not mod:
+        import imp
+
+        (fd, pathname, description) = imp.find_module(mn)
+        try:
+            mod = imp.load_module(mn, fd, pathname, description)
+        finally:
+            fd.close()
+
+    if not mod:
+        throw(Exc.cannot_load_module, module_name=module_name)
+
+    App, argv_offs = getattr(mod, str(class_name), None), 0
+    if not App:
+        # class_name is then first parameter of the App if we can determine
+        # it (one class in the module):
+        argv_offs = -1
+        App = [getattr(mod, n) for n in dir(mod) if is_cls(getattr(mod, n))]
+
+        if len(App) > 1:
+            throw(Exc.non_unique, classes=[A.__name__ for A in App])
+        if len(App) == 1:
+            App = App[0]
+
+    if not App:
+        throw(
+            Exc.app_class_not_found,
+            class_name=class_name,
+            module_name=module_name,
+        )
+    return App, argv_offs
+
+
 @attr.s
 class app(object):
     """The App decorator"""
@@ -65,6 +112,9 @@ class app(object):
     # fmt: on
 
     log = None
+    # devapp's own, from switches only (see switches) - as keys or actions
+    # they would take short forms and prefixes of the user's module names:
+    _switches = {}
 
     def format_result(ac, res):
         if ac.fmt_res is False:
@@ -95,6 +145,12 @@ class app(object):
             )[:2]
 
             res = func(app())
+            if is_async(res):
+                # called within a running loop - we print, not return it:
+                from .aio import wait
+
+                aw = res
+                res = wait(lambda: aw, thread=True)
             # except ValueError as ex:
         except Exception as ex:
             # print('debug', ex)
@@ -123,68 +179,203 @@ class app(object):
         argv of the app itself.
         """
 
-        mod = None
-        mn = module_name
-        for i in range(2):
-            try:
-                mod = __import__(mn)
-                break
-            except:
-                if mn.endswith('.py'):
-                    mn = os.path.abspath(mn)
-                    sys.path.insert(0, os.path.dirname(mn))
-                    mn = mn.rsplit('/', 1)[1][:-3]
-        if not mod:
-            import imp
-
-            (fd, pathname, description) = imp.find_module(mn)
-            try:
-                mod = imp.load_module(mn, fd, pathname, description)
-            finally:
-                fd.close()
-
-        if not mod:
-            throw(Exc.cannot_load_module, module_name=module_name)
-
-        App, argv_offs = getattr(mod, str(class_name), None), 0
-        if not App:
-            # class_name is then first parameter of the App if we can determine
-            # it (one class in the module):
-            argv_offs = -1
-            App = [
-                getattr(mod, n) for n in dir(mod) if is_cls(getattr(mod, n))
-            ]
-
-            if len(App) > 1:
-                throw(Exc.non_unique, classes=[A.__name__ for A in App])
-            if len(App) == 1:
-                App = App[0]
-
-        if not App:
-            throw(
-                Exc.app_class_not_found,
-                class_name=class_name,
-                module_name=module_name,
-            )
+        App, argv_offs = load_app_class(module_name, class_name)
+        sw = ac._switches
         if not ac.cli_argv:
-            ac.cli_argv = sys.argv[
-                sys.argv.index(module_name) + 2 + argv_offs :
-            ]
+            # all after the module (see switches), w/o the class name:
+            ac.cli_argv = sw.get('argv', [])[1 + argv_offs :]
+        if 'serve' in sw:
+            if argv_offs and is_str(class_name):
+                throw(
+                    Exc.app_class_not_found,
+                    class_name=class_name,
+                    module_name=module_name,
+                )
+            return ac.run_serve(App, module_name, sw.get('socket'))
+        if 'completion' in sw:
+            shell, prog = sw.get('shell'), sw.get('prog')
+            return ac.run_completion(App, module_name, shell, prog)
+        if 'batch' in sw:
+            kw = dict([(k, sw[k]) for k in ('jobs', 'ordered') if k in sw])
+            return ac.run_batch(App, sw['batch'], **kw)
         ac.imp_name = App
         res = call_if_cls(ac, '', App)
         return res
 
+    def run_batch(ac, App, batch, jobs=0, ordered=False):
+        """Runs App for every line of the batch file (- for stdin), jobs
+        (default: cpus) forked at a time, the args given on the command line
+        in common. Writes a JSON line per run, with its line number i and the
+        result or the error - in completion order, unless ordered.
+        """
+        import json
+        from .serve import launch
+
+        log = get_lazy_log(ac.log_level, log_cfg(ac))
+        try:
+            fd = sys.stdin if batch == '-' else open(batch)
+        except (IOError, OSError) as ex:
+            error(Exc.file_not_found, fn=batch, exc=str(ex))
+            sys.exit(1)
+        lines = []  # line number by launch index
+
+        def argvs():
+            for n, argv in batch_argvs(fd, ac.cli_argv or ()):
+                lines.append(n)
+                yield argv
+
+        # stdout is for the results, the children's output goes to stderr:
+        res = launch(App, argvs(), jobs, log=log, stdout=2)
+        done, nxt, errs = {}, 0, 0
+        try:
+            for i, r, ex in res:
+                n = lines[i]
+                if ex is None:
+                    r = {'i': n, 'result': r}
+                else:
+                    errs += 1
+                    r = {'i': n, 'error': [type(ex).__name__] + list(ex.args)}
+                done[i] = json.dumps(r, default=str)
+                if not ordered:
+                    nxt = i
+                while nxt in done:
+                    print(done.pop(nxt))
+                    nxt += 1
+                sys.stdout.flush()
+        finally:
+            if fd is not sys.stdin:
+                fd.close()
+        if errs:
+            sys.exit(1)
+
+    def run_completion(ac, App, module_name, shell=None, prog=None):
+        """Prints the shell (bash, zsh) completion script for the App of
+        module_name, writes its index. Usage:
+        eval "$(devapp --completion [--shell zsh] [--prog NAME] x.py)"
+        """
+        from .completion import write
+
+        shell = shell or 'bash'
+        prog = prog or os.path.basename(module_name)
+        script = write(App, prog, shell)
+        print(script)
+        return script
+
+    def run_serve(ac, App, module_name, socket=None):
+        """Serves the App of module_name on a Unix socket, forking a run per
+        client (devapps/serve.py, run as script). Usage:
+        devapp --serve x.py & python -S .../devapps/serve.py <socket> [args]
+        """
+        from .plan import compiled
+        from .serve import serve, socket_path
+
+        compiled(App)
+
+        def run(argv):
+            ac.cli_argv, ac.imp_name = list(argv), App
+            call_if_cls(ac, '', App)
+
+        fn = socket or socket_path(os.path.basename(module_name))
+        serve(fn, run)
+
     def do_help(ac):
+        from .help import render_help
+
         h = render_help(ac, 'h', None)
         print(h)
         return h
 
 
+def batch_argvs(fd, common):
+    """(line number, argv) per line of fd, argv from CLI args (shell quoted)
+    or a JSON object of key values, nested ones as dotted keys. Empty lines
+    and # comments skipped."""
+    import json
+    import shlex
+
+    def flat(d, pre=''):
+        for k, v in d.items():
+            if isinstance(v, dict):
+                for kv in flat(v, pre + k + '.'):
+                    yield kv
+                continue
+            v = v if is_str(v) else json.dumps(v)
+            yield '%s%s=%s' % (pre, k, v)
+
+    for n, line in enumerate(fd, 1):
+        line = line.strip()
+        if not line or line[0] == '#':
+            continue
+        if line[0] == '{':
+            yield n, list(common) + list(flat(json.loads(line)))
+        else:
+            yield n, list(common) + shlex.split(line)
+
+
+# devapp's switches, given before the module:
+# switch -> (name, with value, the switch it requires)
+switch_names = {
+    '--batch': ('batch', True, None),
+    '-j': ('jobs', True, '--batch'),
+    '--ordered': ('ordered', False, '--batch'),
+    '--serve': ('serve', False, None),
+    '--socket': ('socket', True, '--serve'),
+    '--completion': ('completion', False, None),
+    '--shell': ('shell', True, '--completion'),
+    '--prog': ('prog', True, '--completion'),
+}
+
+
+def switches(argv):
+    """Takes devapp's switches (switch_names) given before the module out of
+    argv, returns them by name - and the args after the module (argv).
+    Module and class name we pass as keys: as positionals our prefix and
+    short key matching would take them (devapp co.py: colors)."""
+    sw, r, i = {}, [], 0
+    while i < len(argv):
+        a = argv[i]
+        name, with_val, req = switch_names.get(a, (None, False, None))
+        if with_val:
+            if i + 1 == len(argv):
+                throw(Exc.require_value, switch=a)
+            sw[name] = argv[i + 1]
+            i += 2
+            continue
+        if name:
+            sw[name] = True
+        elif '=' not in a:
+            # the module:
+            r.append('module_name=' + a)
+            sw['argv'] = argv[i + 1 :]
+            if sw['argv'] and '=' not in sw['argv'][0]:
+                r.append('class_name=' + sw['argv'][0])
+            break
+        else:
+            r.append(a)
+        i += 1
+    argv[:] = r
+    for a, (name, with_val, req) in sorted(switch_names.items()):
+        if name in sw and req and switch_names[req][0] not in sw:
+            throw(Exc.switch_requires, switch=a, requires=req)
+    if 'jobs' in sw:
+        sw['jobs'] = int(sw['jobs'])
+    return sw
+
+
 def run():
     """Entrymethod in setup.py for devapps executable
     We first configure devapps itself, then configure the class, then run
     Example:
-    devapps colors=false modulefilename classname foo=bar
+    devapp colors=false modulefilename classname foo=bar
+
+    Batch, an argv set per line of FILE (or stdin), in a process pool:
+    devapp --batch FILE|- [-j N] [--ordered] modulefilename foo=bar
+
+    Resident server, for the client in devapps/serve.py:
+    devapp --serve [--socket PATH] modulefilename
+
+    Shell completion script (and index):
+    devapp --completion [--shell zsh] [--prog NAME] modulefilename
 
     """
 
@@ -196,5 +387,13 @@ def run():
     for v in attrs:
         setattr(App, v.name, attr.ib(default=v.default, validator=v.validator))
     get_lazy_log('error', log_cfg(App))
+    argv = sys.argv[1:]
+    try:
+        sw = switches(argv)
+    except Exception:
+        sys.exit(1)  # logged
+    sys.argv[1:] = argv
     acapp, func = configure(App, req_args_complete=True)[:2]
-    res = func(acapp())
+    ac = acapp()
+    ac._switches = sw
+    res = func(ac)
@@ -1,14 +1,42 @@
 from __future__ import absolute_import, print_function
 from .common import nil, throw, Exc, is_str, PY2, breakpoint
 from ast import literal_eval
+from array import array
 from functools import partial
+import sys
 import attr
 
 
-filepath = '<filepath>'
+t_attr = type(attr.ib())
 
+# Limits (chars) for structured string values (JSON, python literals), longer
+# ones we reject before parsing. literal_eval builds an AST, costing about
+# 10 times the memory of the result, so it gets its own:
+CFG = {'max_len': 64 * 1024 * 1024, 'max_literal_len': 1024 * 1024}
 
-t_attr = type(attr.ib())
+
+@attr.s(repr=False)
+class filepath(object):
+    """Parameter kind: A read only array, backed by a file. Given the path
+    of a .npy or raw (little endian) binary file the value is the mapped
+    file, a numpy.memmap when the app uses numpy, else a memoryview over an
+    mmap. Nothing is read before accessed.
+
+        table = filepath('d')  # struct format of the items (raw: 'B')
+        ids = filepath         # required
+
+    Not given, the value is the (falsy) filepath.
+    """
+
+    fmt = attr.ib(None)
+
+    def __bool__(self):
+        return False
+
+    __nonzero__ = __bool__
+
+    def __repr__(self):
+        return 'filepath(%r)' % self.fmt if self.fmt else 'filepath'
 
 
 # for PY2:
@@ -18,6 +46,7 @@ class plain_class:
 
 
 _ = plain_class
+str_types = (str, unicode) if PY2 else (str,)
 t_funcs = (type(lambda x: x), type(_.__), type(partial(_.__)))
 if PY2:
 
@@ -29,9 +58,32 @@ else:
     is_cls = lambda cls: type(cls) == type(_)
 
 
+def parse_struct(s):
+    """'[1, 2]', '{"a": 1}', "('a', 1)": By the C JSON decoder, python only
+    syntax (tuples, single quotes, ...) by literal_eval"""
+    n = len(s)
+    if n > CFG['max_len']:
+        throw(Exc.value_too_long, len=n, max_len=CFG['max_len'])
+    if s[0] != '(':
+        import json
+
+        try:
+            return json.loads(s)
+        except ValueError:
+            pass
+    if n > CFG['max_literal_len']:
+        m = CFG['max_literal_len']
+        throw(Exc.value_too_long, len=n, max_literal_len=m, json=False)
+    return literal_eval(s)
+
+
+def too_long(ex):
+    return ex.args[:1] == (Exc.value_too_long,)
+
+
 def str_to_dict(cast, s, dflt):
     if s.startswith('{'):
-        return literal_eval(s)
+        return parse_struct(s)
     try:
         return dict(
             [
@@ -45,7 +97,7 @@ def str_to_dict(cast, s, dflt):
 
 def str_to_list(cast, s, dflt):
     if s[0] in ['[', '(']:
-        l = list(literal_eval(s))
+        l = list(parse_struct(s))
     else:
         l = [i.strip() for i in s.split(',')]
     return l
@@ -53,12 +105,95 @@ def str_to_list(cast, s, dflt):
 
 def str_to_tuple(cast, s, dflt):
     if s[0] in ['[', '(']:
-        l = literal_eval(s)
+        l = parse_struct(s)
     else:
         l = [i.strip() for i in s.split(',')]
     return tuple(l)
 
 
+def str_to_numbers(s):
+    """'1, 2,3' or '[1,2,3]' -> ['1', ' 2', '3'] (int and float accept
+    the blanks)"""
+    s = s.strip().lstrip('[(').rstrip(')]')
+    return s.split(',') if s.strip() else []
+
+
+def to_array(typecode, l):
+    conv = float if typecode in 'fd' else int
+    try:
+        return array(typecode, map(conv, l))
+    except ValueError:
+        # '1.5' into ints, like Cast.int:
+        return array(typecode, [int(float(i)) for i in l])
+
+
+def is_buffer(v):
+    """Compact typed sequences (array.array, numpy arrays, filepath), as
+    values or types: Their value (typecode, dtype) and not only their type
+    determines the cast, also of non string provider values"""
+    t = v if isinstance(v, type) else type(v)
+    if issubclass(t, (array, filepath)):
+        return True
+    return hasattr(t, '__array_interface__')
+
+
+def by_value(v):
+    """Defaults which we cast into by value, not only type, also values of
+    non string providers: buffers and (non empty) dicts, as schemas"""
+    return is_buffer(v) or isinstance(v, dict) and len(v) > 0
+
+
+# .npy dtypes -> struct formats:
+npy_formats = dict([('i%s' % array(f).itemsize, f) for f in 'bhiq'])
+npy_formats.update([('u%s' % array(f).itemsize, f.upper()) for f in 'bhiq'])
+npy_formats.update({'b1': '?', 'f4': 'f', 'f8': 'd'})
+
+
+def npy_header(buf):
+    """(offset of the data, struct format, shape) of .npy file contents"""
+    import struct
+
+    if buf[:6] != b'\x93NUMPY':
+        raise ValueError('Not a .npy file')
+    if buf[6:7] == b'\x01':
+        offs, hl = 10, struct.unpack('<H', buf[8:10])[0]
+    else:
+        offs, hl = 12, struct.unpack('<I', buf[8:12])[0]
+    h = literal_eval(bytes(buf[offs : offs + hl]).decode('latin1'))
+    descr, shape = h['descr'], h['shape']
+    if descr[0] not in '<|' or descr[1:] not in npy_formats:
+        raise ValueError('Unsupported dtype %s' % descr)
+    if h['fortran_order'] and len(shape) > 1:
+        raise ValueError('Fortran order')
+    return offs + hl, npy_formats[descr[1:]], shape
+
+
+def map_file(fn, fmt=None):
+    """The file fn, mapped read only, as array of items of struct format
+    fmt (.npy: the format of the file, checked against fmt if given)"""
+    np = sys.modules.get('numpy')
+    npy = fn.endswith('.npy')
+    if np is not None:
+        if not npy:
+            return np.memmap(fn, dtype=np.dtype('<' + (fmt or 'B')), mode='r')
+        a = np.load(fn, mmap_mode='r')
+        if fmt and a.dtype != np.dtype('<' + fmt):
+            raise ValueError('%s has dtype %s' % (fn, a.dtype))
+        return a
+    import mmap
+
+    if sys.byteorder != 'little':
+        raise ValueError('Little endian files, not mappable here')
+    with open(fn, 'rb') as fd:
+        mv = memoryview(mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ))
+    if not npy:
+        return mv.cast(fmt or 'B')
+    offs, f, shape = npy_header(mv)
+    if fmt and f != fmt:
+        raise ValueError('%s has format %s' % (fn, f))
+    return mv[offs:].cast(f, shape)
+
+
 false_strs = [
     '',
     '0',
@@ -125,16 +260,54 @@ class Cast(object):
     @classmethod
     def dict(cast, s, dflt, ctx):
         if isinstance(s, str):
-            return str_to_dict(cast, s, dflt)
+            s = str_to_dict(cast, s, dflt)
         d = dict(s) if not isinstance(s, dict) else s
         if not isinstance(dflt, dict) or not dflt:
             return d
-        c = cast.__call__
-        if len(dflt) == 1:
-            # apply for all:
-            K, V = tuple(dflt.items())[0]
-            return dict([(c(k, K, ctx), c(v, V, ctx)) for k, v in d.items()])
-        raise Exception(MultiKeyNotSupported)
+        casters, r, k, c = cast.schema(dflt), {}, None, None
+        try:
+            if isinstance(casters, tuple):
+                # apply for all:
+                K, V = casters
+                for k, v in d.items():
+                    r[K[0](k, K[1], ctx)] = V[0](v, V[1], ctx)
+                return r
+            for k, v in d.items():
+                c = casters.get(k)
+                # keys not in the schema we keep as they are:
+                r[k] = c[0](v, c[1], ctx) if c else v
+            return r
+        except Exception as ex:
+            if too_long(ex) or ex.args[:1] == (Exc.cannot_cast,):
+                # from within, with the inner key or value:
+                raise
+            c = c or casters[1]  # all items: V
+            n = try_find_name(c[0], cast)
+            throw(Exc.cannot_cast, key=k, got=d.get(k), expected_type=n)
+
+    @classmethod
+    def schema(cast, dflt):
+        """The casters for a dict default, compiled once per dflt object:
+        {K: V}: (K, V) for all items. Else {key: caster of dflt[key]}.
+        Casters are tuples (caster, dflt) - called w/o dispatch and error
+        wrapping. Schema values w/o caster (e.g. None) take any value.
+        """
+        r = cast._schemas.get(id(dflt))
+        if r is None or r[0] is not dflt:
+            if len(dflt) == 1:
+                K, V = tuple(dflt.items())[0]
+                c = ((cast.find(K)[0], K), (cast.find(V)[0], V))
+            else:
+                c = [(k, (cast.find(v)[0], v)) for k, v in dflt.items()]
+                c = dict([(k, f) for k, f in c if f[0]])
+            if len(cast._schemas) > 1000:
+                # adhoc defaults, cast(s, {..}), in a loop:
+                cast._schemas.clear()
+            r = cast._schemas[id(dflt)] = (dflt, c)
+        return r[1]
+
+    # id(dflt) -> (dflt, compiled schema):
+    _schemas = {}
 
     @classmethod
     def list(cast, s, dflt, ctx):
@@ -154,14 +327,53 @@ class Cast(object):
 
         return tuple(cast.deep_seq(l, dflt, tuple, ctx))
 
+    @classmethod
+    def array(cast, s, dflt, ctx):
+        """Bulk parse into a typed array, e.g. dflt array('d')"""
+        tc = dflt.typecode if isinstance(dflt, array) else 'd'
+        if isinstance(s, str_types):
+            s = str_to_numbers(s)
+        return to_array(tc, s)
+
+    @classmethod
+    def ndarray(cast, s, dflt, ctx):
+        """Bulk parse into a numpy array of the dtype of dflt. Flat input
+        is reshaped to the trailing dimensions of dflt, e.g. coordinates:
+        dflt np.zeros((0, 2)), s '1,2,3,4' -> [[1, 2], [3, 4]]
+        """
+        np = sys.modules['numpy']
+        is_arr = isinstance(dflt, np.ndarray)
+        dtype = dflt.dtype if is_arr else np.float64
+        if isinstance(s, str_types):
+            b = s.strip()
+            if b[:2] in ('[[', '(('):
+                a = np.array(parse_struct(b), dtype=dtype)
+            else:
+                l = str_to_numbers(b)
+                b = ','.join(l)
+                a = np.fromstring(b, dtype=dtype, sep=',') if l else None
+                if a is None or len(a) != len(l):
+                    # empty, or e.g. '1.5' into ints (fromstring stops):
+                    a = np.array(l, dtype=np.float64).astype(dtype)
+        else:
+            a = np.array(s, dtype=dtype)
+        if is_arr and dflt.ndim > 1 and a.ndim == 1:
+            a = a.reshape((-1,) + dflt.shape[1:])
+        return a
+
+    @classmethod
+    def filepath(cast, s, dflt, ctx):
+        """Maps the file at path s, see class filepath"""
+        return map_file(str(s), getattr(dflt, 'fmt', None))
+
     @classmethod
     def deep_seq(cast, l, dflt, into, ctx):
         if not isinstance(dflt, into) or not dflt:
             return l
         if len(dflt) == 1:
-            return [
-                cast.__call__(l[i], dflt[0], ctx) for i in range(0, len(l))
-            ]
+            # same caster for all, resolved once:
+            c = cast.bind(dflt[0])
+            return [c(v, ctx) for v in l]
 
         return [cast.__call__(l[i], dflt[i], ctx) for i in range(0, len(l))]
 
@@ -170,33 +382,64 @@ class Cast(object):
     @classmethod
     def __call__(cast, s, dflt, ctx=None):
         """ public api: cast('3', int)"""
-        into_type = dflt
+        caster, adhoc = cast.find(dflt)
+        if adhoc:
+            return caster(s, dflt=dflt, ctx=ctx)
+        return cast.run(caster, s, dflt, ctx)
+
+    @classmethod
+    def find(cast, dflt):
+        """Resolves the caster for dflt (a value, type, caster or caster name)
+        Returns (caster, is_adhoc) - adhoc: a function, not registered.
+        Resolved casters of types are memoized (till the next add_caster).
+        """
+        t = type(dflt)
+        if t not in str_types:
+            # values other than strings (names) are no keys of _all:
+            caster = cast._found.get(t)
+            if caster:
+                return caster, False
         try:
             caster = cast._all.get(dflt)  # {} unhashable
-        except:
+        except TypeError:
             caster = None
+        if caster:
+            return caster, False
+        into_type = dflt if callable(dflt) else type(dflt)
+        caster = cast._found.get(into_type)
+        if caster:
+            return caster, False
+        caster = cast._all.get(into_type)
         if not caster:
-            if not callable(into_type):
-                into_type = type(dflt)
-            caster = cast._all.get(into_type)
-            if not caster:
-                if hasattr(into_type, '__code__'):
-                    # adhoc caster:
-                    return into_type(s, dflt=dflt, ctx=ctx)
-                try:
-                    mm = into_type.mro()
-                except Exception as ex:
-                    print('breakpoint set')
-                    breakpoint()
-                    keep_ctx = True
-                for m in into_type.mro():
-                    caster = cast._all.get(m)
-                    if caster:
-                        break
+            if hasattr(into_type, '__code__'):
+                # adhoc caster:
+                return into_type, True
+            if not hasattr(into_type, 'mro'):
+                # e.g. a builtin function (f=len):
+                name = getattr(into_type, '__name__', str(into_type))
+                throw(Exc.cannot_cast, expected_type=name, no_caster=True)
+            for m in into_type.mro():
+                caster = cast._all.get(m)
+                if caster:
+                    break
+            if not caster and cast.add_numpy():
+                return cast.find(dflt)
+        if caster and isinstance(into_type, type):
+            cast._found[into_type] = caster
+        return caster, False
+
+    # the memo of find: type -> caster
+    _found = {}
+
+    @classmethod
+    def run(cast, caster, s, dflt, ctx=None):
         if caster:
             try:
                 return caster(s, dflt, ctx)
             except Exception as ex:
+                if too_long(ex) or ex.args[:1] == (Exc.cannot_cast,):
+                    # thrown within, e.g. at a schema key, we keep that:
+                    raise
                 kw = {'expected_type': try_find_name(caster, cast)}
                 if ctx:
                     for k in ('for_param',):
@@ -205,18 +448,43 @@ class Cast(object):
                             kw[k] = v
                 kw['got'] = s
                 throw(Exc.cannot_cast, **kw)
-        if not caster:
-            breakpoint()
+        kw = {'expected_type': type(dflt).__name__, 'got': s}
+        throw(Exc.cannot_cast, no_caster=True, **kw)
+
+    @classmethod
+    def bind(cast, dflt):
+        """The caster for dflt, resolved once. Call with (s, ctx=None)"""
+        caster, adhoc = cast.find(dflt)
+        if adhoc:
+            return lambda s, ctx=None: caster(s, dflt=dflt, ctx=ctx)
+        return lambda s, ctx=None: cast.run(caster, s, dflt, ctx)
 
     @classmethod
     def get(cast, caster):
         return cast._all.get(caster)
 
+    # counts the registrations - resolved casters kept elsewhere are
+    # outdated when this changed:
+    version = 0
+
+    @classmethod
+    def add_numpy(cast):
+        """Registers the ndarray caster, when numpy is imported - by the
+        app, we don't. True if newly registered."""
+        np = sys.modules.get('numpy')
+        if np is None or np.ndarray in cast._all:
+            return False
+        cast.add_caster(np.ndarray)
+        return True
+
     @classmethod
     def add_caster(cast, caster, name=None):
         if cast._all is None:
             cast._all = {}
         register_type_or_func(cast, caster, name)
+        cast._found.clear()
+        cast._schemas.clear()
+        cast.version += 1
 
 
 def try_find_name(caster, cast):
@@ -240,7 +508,8 @@ def funcname(f):
 
 cast = Cast()
 
-for c in [cast.nearest_int, int, bool, float, str, dict, list, tuple]:
+casters = [cast.nearest_int, int, bool, float, str, dict, list, tuple]
+for c in casters + [array, filepath]:
     try:
         cast.add_caster(c)
     except Exception as ex:
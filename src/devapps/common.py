@@ -1,9 +1,14 @@
 from __future__ import absolute_import, print_function, unicode_literals
 from functools import partial
-import sys, time
-import pdb
+import os, sys, time
+
+
+def breakpoint():
+    """pdb.set_trace - imported all around (py2 tests), pdb only on use"""
+    import pdb
+
+    pdb.Pdb().set_trace(sys._getframe().f_back)
 
-breakpoint = pdb.set_trace  # leave - imported all around, for py2 tests
 
 nil = '\x01'  # marker
 PY2 = sys.version_info[0] < 3
@@ -35,6 +40,28 @@ if PY2:
 
     sp.getoutput = _
 
+
+def cpu_count():
+    """os.cpu_count (py3) - 1 if not determinable"""
+    if hasattr(os, 'cpu_count'):
+        return os.cpu_count() or 1
+    import multiprocessing
+
+    try:
+        return multiprocessing.cpu_count()
+    except NotImplementedError:
+        return 1
+
+
+def cache_dir(cfg, name):
+    """cfg['dir'] - None: user_config_dir()/devapps/name (set into cfg)"""
+    d = cfg['dir']
+    if d is None:
+        from appdirs import user_config_dir
+
+        d = cfg['dir'] = os.path.join(user_config_dir(), 'devapps', name)
+    return d
+
 # pdt(t0)
 
 # -------------------------------------------------------------- Error Handling
@@ -42,6 +69,7 @@ class Exc:
     # fmt: off
     cannot_cast                    = 'Cannot cast'
     cannot_cast_to_dict            = 'Cannot cast to dict'
+    value_too_long                 = 'Value too long'
     unmatched                      = 'Unmatched'
     non_unique                     = 'Non unique'
     file_not_found                 = 'File not found'
@@ -50,10 +78,13 @@ class Exc:
     not_a_switch                   = 'Not a known switch'
     require_value                  = 'Value required'
     req_dict_to_setup_class        = 'Require dict to setup class'
-    double_func_call               = 'TWO functions on CLI disallowed'
+    args_of_several_actions        = 'Several actions: args need dotted keys'
+    cyclic_dependency              = 'Cyclic dependency'
     cannot_load_module             = 'Cannot load module'
     app_class_not_found            = 'Application class not found'
     app_error                      = 'Application runtime error'
+    not_private                    = 'Not private'
+    switch_requires                = 'Switch requires another'
     # fmt: on
 
 
@@ -0,0 +1,145 @@
+"""
+Shell completion (bash, zsh), from a static index.
+
+    eval "$(devapp --completion ./calc.py)"               # bash
+    eval "$(devapp --completion --shell zsh ./calc.py)"  # zsh
+
+writes the index of the app and prints the completion function. On tab that
+reads only the index (via awk) - no python, no configure. Re-run after
+changing the app.
+
+The index has one line per completion, tab separated:
+
+    <section path> <kind> <name> <long name>
+
+kind: k key, s section (inner class), a action, v value. Names are the long
+and the short forms (to_shorts). Values (the choices of typed keys) have the
+long key as name and the choice as long name.
+"""
+from __future__ import absolute_import, print_function
+import os
+import re
+
+from .common import cache_dir
+from .plan import compile, k_func, k_inner, k_attr, k_type
+
+# dir: where we keep the indexes. None: below user_config_dir()
+CFG = {'dir': None}
+
+# the candidates for cur, the word completed (-v cur=...). Sections given
+# before the last dot are resolved like the CLI does: long or short name,
+# else a unique prefix:
+awk = r'''
+function res(c, k, s,   i, r, n) {
+  if ((c "\t" k "\t" s) in lk) return lk[c "\t" k "\t" s]
+  for (i = 1; i <= NR; i++)
+    if (ctx[i] == c && knd[i] == k && index(nm[i], s) == 1 && lg[i] != r) {
+      r = lg[i]; n++
+    }
+  return n == 1 ? r : ""
+}
+BEGIN { FS = "\t" }
+{ ctx[NR] = $1; knd[NR] = $2; nm[NR] = $3; lg[NR] = $4
+  lk[$1 "\t" $2 "\t" $3] = $4 }
+END {
+  eq = index(cur, "=")
+  word = eq ? substr(cur, 1, eq - 1) : cur
+  n = split(word, seg, ".")
+  if (n == 0) { n = 1; seg[1] = "" }
+  c = ""
+  for (i = 1; i < n; i++) {
+    s = res(c, "s", seg[i])
+    if (s == "") exit
+    c = c == "" ? s : c "." s
+  }
+  pre = substr(word, 1, length(word) - length(seg[n]))
+  if (eq) {
+    key = res(c, "k", seg[n])
+    val = substr(cur, eq + 1)
+    for (i = 1; i <= NR; i++)
+      if (knd[i] == "v" && ctx[i] == c && nm[i] == key)
+        if (index(lg[i], val) == 1) print word "=" lg[i]
+    exit
+  }
+  # long names, short ones only if no long one matches:
+  for (pass = 1; pass <= 2 && !m; pass++)
+    for (i = 1; i <= NR; i++) {
+      if (ctx[i] != c || knd[i] == "v" || index(nm[i], seg[n]) != 1) continue
+      if (pass == 1 && nm[i] != lg[i]) continue
+      print pre nm[i] (knd[i] == "k" ? "=" : knd[i] == "s" ? "." : ""); m++
+    }
+}
+'''
+
+bash = '''%(name)s() {
+    local line=${COMP_LINE:0:COMP_POINT}
+    local cur=${line##*[[:space:]]} IFS=$'\\n'
+    COMPREPLY=($(awk -v cur="$cur" '%(awk)s' %(index)s))
+    # bash splits words at '=', its word is the part after it:
+    if [[ $cur == *=* && $COMP_WORDBREAKS == *=* ]]; then
+        COMPREPLY=("${COMPREPLY[@]#"${cur%%=*}="}")
+    fi
+}
+complete -o nospace -F %(name)s %(prog)s
+'''
+
+zsh = '''(( $+functions[compdef] )) || { autoload -U +X compinit && compinit }
+autoload -U +X bashcompinit && bashcompinit
+'''
+
+
+def choices(l):
+    """The values to offer for attr plan l"""
+    k, v, t, ft, kind, caster = l
+    if kind == k_attr:
+        ch = v.metadata.get('choices')
+        opts = getattr(v._validator, 'options', None)
+        t = v.type or type(v._default)
+    else:
+        ch = opts = None
+        t = v if kind == k_type else t
+    if ch or opts:
+        return [str(c) for c in ch or opts]
+    return ['true', 'false'] if t == bool else []
+
+
+def rows(cp, r):
+    """The index lines of class plan cp and its inner ones"""
+    ctx = '.'.join(cp.path)
+    shorts = {}
+    for s, k in (cp.shorts or {}).items():
+        if s != k:
+            shorts.setdefault(k, []).append(s)
+    for l in cp.attrs:
+        k, kind = l[0], l[4]
+        c = 'a' if kind == k_func else 's' if kind == k_inner else 'k'
+        for n in [k] + sorted(shorts.get(k, ())):
+            r.append((ctx, c, n, k))
+        if kind == k_inner:
+            rows(l[5], r)
+        elif c == 'k':
+            r.extend([(ctx, 'v', k, v) for v in choices(l)])
+    return r
+
+
+def index(App):
+    return rows(compile(App).root, [])
+
+
+def quote(s):
+    return "'%s'" % s.replace("'", "'\\''")
+
+
+def write(App, prog, shell='bash', fn=None):
+    """Writes the index of App, returns the completion script for prog"""
+    fn = fn or os.path.join(cache_dir(CFG, 'compl'), prog + '.tsv')
+    d = os.path.dirname(fn)
+    if not os.path.exists(d):
+        os.makedirs(d)
+    tmp = '%s.%s' % (fn, os.getpid())
+    with open(tmp, 'w') as fd:
+        fd.write(''.join(['\t'.join(l) + '\n' for l in index(App)]))
+    os.rename(tmp, fn)
+    m = {'awk': awk, 'index': quote(fn), 'prog': quote(prog)}
+    m['name'] = '_devapps_' + re.sub('[^A-Za-z0-9_]', '_', prog)
+    return (zsh if shell == 'zsh' else '') + bash % m
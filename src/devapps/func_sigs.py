@@ -6,9 +6,12 @@ if PY2:
     from funcsigs import signature
 else:
     from inspect import signature
-from .casting import cast, is_cls
+from .casting import cast, is_cls, attr
 
 import time
+import weakref
+from types import FunctionType
+from collections import OrderedDict
 
 
 def flatten_dotted_arg_from_dict(d, pth=None):
@@ -28,37 +31,66 @@ def fix_dotted_cli_vals(cli):
     {foo:{bar:{baz: is_set}}}
     We recreate into foo.bar.baz=is_set like other position vals here:
     """
-    r = ()
+    r = []
     for K, d in cli:
         kv = flatten_dotted_arg_from_dict(d)
         if kv:
             K, d = '%s.%s' % (K, kv), 'is_set'
-        r += ((K, d),)
+        r.append((K, d))
     return r
 
 
-def map_args_to_func_sig(
-    f, cli, ctx, map_from=-1, prefer_positional=True, deep=True, cast=cast
-):
-    """
-    inspect.signature based version.
+@attr.s
+class Binding(object):
+    """What we need to know about a function, to map arguments to it"""
 
-    Py2: This WOULD work using the signature simulation for py2 (funcsigs)
-    from https://funcsigs.readthedocs.io/en/0.4/
-    but perf is lousy. See below, for 2 we do it in getargspec
+    # fmt: off
+    sig_dict   = attr.ib()  # the parameters
+    pos_params = attr.ib()  # names of the positional ones, from map_from on
+    pos_index  = attr.ib()  # their position within pos_params
+    have_va    = attr.ib()  # has *args
+    defaults   = attr.ib()  # param name -> default (nil: none)
+    casters    = attr.ib()  # param name -> caster of the default
+    pos_or_kw  = attr.ib()  # names of the leading POSITIONAL_OR_KEYWORD ones
+    version    = attr.ib()  # of the cast registry, when resolving casters
+    dflts_obj  = attr.ib()  # func.__defaults__, to see if changed
+    # fmt: on
 
-    Maybe it can be done more effective, not sure yet:
 
-    # update: We use funcsigs now for py2... maybe later add the argspec
-    # version back again.
+default_cast = cast
 
-    """
-    cli = fix_dotted_cli_vals(cli)
-    if map_from == -1:
-        # signature does not deliver cls or self, so no effort here:
-        map_from = 0
+
+def dflts_obj(f):
+    f = getattr(f, '__func__', f)
+    return getattr(f, '__defaults__', None), getattr(f, '__kwdefaults__', 0)
+
+
+def outdated(b, f):
+    """binding outdated, since casters registered or defaults changed?"""
+    if b.version != cast.version:
+        return True
+    d = dflts_obj(f)
+    return not (d[0] is b.dflts_obj[0] and d[1] is b.dflts_obj[1])
+
+
+class Casters(dict):
+    """param name -> caster of its default, resolved on first use: Defaults
+    of params never given need no caster (and may have none, f=len)"""
+
+    def __init__(self, defaults):
+        self.defaults = defaults
+
+    def __missing__(self, n):
+        c = self[n] = cast.bind(self.defaults[n])
+        return c
+
+
+def build_binding(f, map_from):
     sig_dict = signature(f).parameters
-    va_pos, have_va, pos_params = 0, False, []
+    have_va, pos_params, defaults = False, [], {}
+    for n, p in sig_dict.items():
+        defaults[n] = p.default if p.default != p.empty else nil
+    casters = Casters(defaults)
     i = 0
     for n, p in sig_dict.items():
         i += 1
@@ -67,73 +99,155 @@ def map_args_to_func_sig(
         if p.kind == p.VAR_POSITIONAL:
             have_va = True
             break
-        va_pos += 1
         pos_params.append(n)
+    pos_or_kw = []
+    for n in list(sig_dict.keys())[map_from:]:
+        p = sig_dict[n]
+        if p.kind != p.POSITIONAL_OR_KEYWORD:
+            break
+        pos_or_kw.append(n)
+    return Binding(
+        sig_dict=sig_dict,
+        pos_params=tuple(pos_params),
+        pos_index=dict([(n, i) for i, n in enumerate(pos_params)]),
+        have_va=have_va,
+        defaults=defaults,
+        casters=casters,
+        pos_or_kw=tuple(pos_or_kw),
+        version=cast.version,
+        dflts_obj=dflts_obj(f),
+    )
 
-    args = [nil for i in pos_params]
-    kw = {}
 
-    def default(n):
-        d = sig_dict.get(n)
-        if not d:
-            return nil
-        return d.default if d.default != d.empty else nil
+class BindingCache(object):
+    """Bindings by function (and map_from).
+    Functions are weakly referenced and at most maxsize ones are kept, least
+    recently used ones are evicted.
+    """
 
-    idx, leng = -1, len(cli) - 1
-    while idx < leng:
-        idx += 1
-        n, v = cli[idx]
-        if v != 'is_set':
-            d = default(n)
-            if d != nil:
-                v = cast(v, d, {'for_param': n})
-            if have_va and n in pos_params:
-                args[pos_params.index(n)] = v
-                pos_params.remove(n)
-            else:
-                kw[n] = v
-                pos_params.remove(n) if n in pos_params else None
+    def __init__(self, maxsize=2048):
+        self.maxsize = maxsize
+        self.d = OrderedDict()
+
+    def gone(self, ref):
+        self.d.pop(ref, None)
+
+    def get(self, f, map_from):
+        try:
+            ref = weakref.ref(f)
+        except TypeError:
+            # not weakly referencable:
+            return build_binding(f, map_from)
+        m = self.d.get(ref)
+        if m is None:
+            m = {}
         else:
-            # v = is_set when no key is given, just value:
-            if pos_params:
-                vv = n  # the value
-                n = pos_params.pop(0)  # the key
-                d = default(n)
-                v = cast(vv, d, {'for_param': n}) if d != nil else vv
-            if have_va:
-                app = True
-                for i in range(0, len(args)):
-                    if args[i] == nil:
-                        args[i] = v
-                        app = False
+            try:
+                self.d.move_to_end(ref)
+            except (KeyError, AttributeError):
+                pass  # gone meanwhile or PY2
+        b = m.get(map_from)
+        if b is None or outdated(b, f):
+            b = m[map_from] = build_binding(f, map_from)
+            if not m is self.d.get(ref):
+                self.d[weakref.ref(f, self.gone)] = m
+                while len(self.d) > self.maxsize:
+                    try:
+                        self.d.popitem(last=False)
+                    except KeyError:
                         break
-                if app:
-                    args.append(n)
-            else:
-                kw[n] = v
-    offset = args.index(nil) if nil in args else 0
-    for n in list(pos_params):
-        p = sig_dict[n]
-        if p.default != p.empty and not is_cls(p):
+        return b
+
+
+bindings = BindingCache()
+binding = bindings.get
+
+
+def map_args_to_func_sig(
+    f, cli, ctx, map_from=-1, prefer_positional=True, deep=True, cast=cast
+):
+    """
+    Mapping the (key, value) args (is_set as value: positional) to the
+    signature of f. The inspection of f we cache, see BindingCache.
+
+    Returns the positional args and the keyword args for f.
+
+    Py2: We use funcsigs.
+    """
+    cli = fix_dotted_cli_vals(cli)
+    if map_from == -1:
+        # signature does not deliver cls or self, so no effort here:
+        map_from = 0
+    b = binding(f, map_from)
+    have_va, defaults, casters = b.have_va, b.defaults, b.casters
+    if cast is not default_cast:
+        casters = dict(
+            [
+                (n, lambda v, ctx, d=d: cast(v, d, ctx))
+                for n, d in defaults.items()
+            ]
+        )
+
+    # Linear in the number of args (we get 100k file names via *args):
+    # pos: the positional params, slot: their index in args, taken: those
+    # with values, first: cursor to the first not taken one.
+    pos, slot = b.pos_params, b.pos_index
+    args = [nil] * len(pos)
+    kw, taken = {}, set()
+    left, first = len(pos), 0
+
+    for n, v in cli:
+        if v != 'is_set':
+            d = defaults.get(n, nil)
+            if d is not nil:
+                v = casters[n](v, {'for_param': n})
+            if n in slot and not n in taken:
+                taken.add(n)
+                left -= 1
+                if have_va:
+                    args[slot[n]] = v
+                    continue
+            kw[n] = v
+        elif left:
+            # v = is_set when no key is given, just value -> next free param:
+            while pos[first] in taken:
+                first += 1
+            vv, n = n, pos[first]  # the value, the key
+            taken.add(n)
+            left -= 1
+            d = defaults[n]
+            v = casters[n](vv, {'for_param': n}) if d is not nil else vv
             if have_va:
-                args[pos_params.index(n) + offset] = p.default
-                pos_params.remove(n)
+                args[slot[n]] = v
             else:
-                kw[n] = p.default
-                pos_params.remove(n)
+                kw[n] = v
+        elif have_va:
+            args.append(n)
+        else:
+            kw[n] = v
 
-    argt = ()
-    for a in args:
-        if a != nil:
-            argt += (a,)
+    # the not given ones, with defaults:
+    pos_params = []
+    for n in pos:
+        if n in taken:
+            continue
+        d = defaults[n]
+        if d is nil:
+            pos_params.append(n)
+        elif have_va:
+            args[slot[n]] = d
+        else:
+            kw[n] = d
+
+    argt = tuple([a for a in args if a is not nil])
 
     allow_types = ctx.get('allow_type_args', False)
     if ctx.get('req_args_complete'):
 
         ps, err = [], Exc.require_value
         for p in pos_params:
-            d = default(p)
-            if default(p) == nil:
+            d = defaults[p]
+            if d == nil:
                 ps.append({'param': p})
             if not allow_types and type(d) == type:
                 ps.append({'param': p, 'type': d.__name__})
@@ -146,10 +260,7 @@ def map_args_to_func_sig(
             throw(err, **ps[-1])
 
     if prefer_positional:
-        for p in list(sig_dict.keys())[map_from:]:
-            v = sig_dict[p]
-            if v.kind != v.POSITIONAL_OR_KEYWORD:
-                break
+        for p in b.pos_or_kw:
             vm = kw.pop(p, nil)
             if vm != nil:
                 argt += (vm,)
@@ -165,32 +276,46 @@ def pretty_type(sigstr):
 
 
 def repl_func_defaults(func, dflts, provider):
-    orig = func.__defaults__
+    """Returns a copy of func, with defaults replaced by those in dflts
+    (func itself stays as is)"""
+    dflts = dict(dflts)
+    f = func.__func__ if PY2 else func
+    orig = f.__defaults__
     pos = 0
     new = ()
     mod = {}
     old = {}
-    for n, p in signature(func).parameters.items():
+    b = binding(func, 0)
+    for n, p in b.sig_dict.items():
         if p.default == p.empty:
             continue
         od, newd = orig[pos], dflts.pop(n, nil)
         old[n] = od
         if newd != nil and newd != od:
-            mod[n] = newd = cast(newd, od, {'for_param': n})
+            mod[n] = newd = b.casters[n](newd, {'for_param': n})
         else:
             newd = od
         new += (newd,)
         pos += 1
 
+    # we mark what we did:
+    d = f.__doc__ or ''
+    d += '\n:::warning\nDefaults modified (by %s):' % provider
+    for k, v in mod.items():
+        d += '\n- %s: %s (was %s)' % (k, v, pretty_type(old[k]))
+    d += '\n:::\n'
+    return func_copy(f, new, d)
+
+
+def func_copy(f, defaults, doc):
+    c = FunctionType(
+        f.__code__, f.__globals__, f.__name__, defaults, f.__closure__
+    )
+    c.__dict__.update(f.__dict__)
+    c.__doc__ = doc
+    c.__module__ = f.__module__
     if not PY2:
-        # we mark what we did:
-        # not writeable in py2:
-        d = func.__doc__ or ''
-        d += '\n:::warning\nDefaults modified (by %s):' % provider
-        for k, v in mod.items():
-            d += '\n- %s: %s (was %s)' % (k, v, pretty_type(old[k]))
-        d += '\n:::\n'
-        func.__doc__ = d
-        func.__defaults__ = new
-    else:
-        func.__func__.__defaults__ = new
+        c.__qualname__ = f.__qualname__
+        c.__kwdefaults__ = f.__kwdefaults__
+        c.__annotations__ = f.__annotations__
+    return c
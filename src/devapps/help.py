@@ -1,45 +1,133 @@
 from __future__ import absolute_import, print_function
 import sys, os
+import hashlib
 from .func_sigs import signature, pretty_type
+from .casting import is_cls
+from .common import debug, throw, Exc, cache_dir
+from .version import __version__
+from . import scan
+from .plan import k_func
 import textwrap
 from inspect import getsource
 
 PY2 = sys.version_info[0] < 3
 
 
+# dir: where we keep the rendered help texts. None: below user_config_dir()
+# enabled: False: always render
+CFG = {'dir': None, 'enabled': True}
+
+
 def termsize():
-    try:
-        # that works in a pipe as well, get_terminal_size not. also not PY2:
-        # windows we don't care.
-        with os.popen('stty size 2>/dev/null', 'r') as fd:
-            l = fd.read().split()
-        r, c = [int(p) for p in l]
-    except:
-        if PY2:
-            r, c = (25, 80)
+    """(rows, cols) of the terminal at stdout, else stdin or stderr (in a
+    pipe), w/o forking stty. COLUMNS and LINES env vars have precedence."""
+    if PY2:
+        return 25, 80
+    import shutil
+
+    s = shutil.get_terminal_size(fallback=(0, 0))
+    for fd in 0, 2:
+        if s.columns:
+            break
+        try:
+            s = os.get_terminal_size(fd)
+        except OSError:
+            pass
+    return s.lines or 25, s.columns or 80
+
+
+def state(app, level, r, files):
+    """Collects what the help of app depends on, besides level and width:
+    the source files of the classes, their names, the shown values and
+    action defaults"""
+    cls = type(app)
+    for c in cls.__mro__[:-1]:
+        fn = scan.src_file(c)
+        if fn and fn not in files:
+            files[fn] = scan.file_hash(fn)
+    r.append(scan.fingerprint(cls))
+    # action defaults, changed by providers (repl_func_defaults):
+    cp = getattr(cls, '_plan_', None)
+    for l in cp.attrs if cp else ():
+        if l[4] == k_func:
+            f = getattr(cls, 'do_' + l[0], None)
+            f = getattr(f, '__func__', f)
+            d = getattr(f, '__defaults__', None)
+            kw = getattr(f, '__kwdefaults__', None)
+            r.append((l[0], repr(d), repr(kw)))
+    values = getattr(app, '_values_', {})
+    for attr in app.__attrs_attrs__:
+        n = attr.name
+        v = values.get(n, attr.default)
+        if is_cls(v) or hasattr(v, 'factory'):
+            if level > 0:
+                state(getattr(app, n), level - 1, r, files)
         else:
-            import shutil
-
-            _ = shutil.get_terminal_size(fallback=(80, 25))
-            r, c = _.lines, _.columns
-    return r, c
-
-
-def render_help(app, level=None, h=None):
-    if level is None:
-        level = 'h'
-    sh_code = False
-    if 'c' in level:
-        sh_code = True
-        level.replace('c', '')
-    as_md = True
-    if 'u' in level:
-        as_md = False
-        level.replace('u', '')
-
-    level = len(level)
-    h = h or 1
-    md = _show_help(app, termsize(), level, sh_code, as_md, h)
+            r.append((n, str(v), attr.metadata.get('provider')))
+    return r
+
+
+def cache_file(app, level, h, cols, path):
+    """(file, key) for the help of app: One file per app, level, width and
+    path, valid for the key within. None: not cachable (no source file)"""
+    cls = getattr(type(app), '_plan_', None)
+    cls = cls.cls if cls else type(app)
+    fn = scan.src_file(cls)
+    if not fn:
+        return None, None
+    try:
+        files = {}
+        r = state(app, parse_level(level)[0], [], files)
+    except Exception as ex:
+        debug('Help not cachable', exc=ex)
+        return None, None
+    k = repr((__version__, sorted(files.items()), r))
+    k = hashlib.sha1(k.encode('utf-8')).hexdigest()
+    n = os.path.basename(scan.cache_file(cls, fn))[:-5]
+    n = '%s.%s.%s.%s.%s.json' % (n, level, h, cols, path or '')
+    return os.path.join(cache_dir(CFG, 'help'), n), k
+
+
+def parse_level(level):
+    """'hhc' -> (2, with source code, as markdown) - 'u': unformatted"""
+    level = level or 'h'
+    sh_code, as_md = 'c' in level, 'u' not in level
+    return len(level.replace('c', '').replace('u', '')), sh_code, as_md
+
+
+def subtree(app, path):
+    """The inner app at dotted path (long or short names)"""
+    for k in path.split('.') if path else ():
+        cp = getattr(type(app), '_plan_', None)
+        k = cp.shorts.get(k, k) if cp and cp.shorts else k
+        inn = getattr(app, k, None)
+        if not hasattr(inn, '__attrs_attrs__'):
+            throw(Exc.unmatched, help_path=path, key=k)
+        app = inn
+    return app
+
+
+def iter_help(app, level=None, h=None, path=None, size=None):
+    """The help for app (or its inner one at dotted path), as generator of
+    sections. Inner classes are rendered up to level (-hh: 2) below it.
+    """
+    app = subtree(app, path)
+    level, sh_code, as_md = parse_level(level)
+    return sections(app, size or termsize(), level, sh_code, as_md, h or 1)
+
+
+def render_help(app, level=None, h=None, path=None):
+    """The help text, from the disk cache if valid"""
+    level, h, size, fn = level or 'h', h or 1, termsize(), None
+    if CFG['enabled']:
+        fn, key = cache_file(subtree(app, path), level, h, size[1], path)
+    if fn:
+        stored = scan.load(fn)
+        if stored and stored.get('key') == key:
+            return stored['md']
+    md = ''.join(iter_help(app, level, h, path, size))
+    if fn:
+        scan.store(fn, {'key': key, 'md': md})
     return md
 
 
@@ -61,7 +149,9 @@ ap = lambda l, a: l.append(a)
 len_to_show_code_as_detail = 1000
 
 
-def _show_help(app, size, level, sh_code, as_md, h):
+def sections(app, size, level, sh_code, as_md, h):
+    """Yields the help of app, section by section: its own, then, while
+    level >= 1, the ones of its inner classes (with level - 1)"""
     md, inner, ad = [], [], []
 
     def hl(s, lev, md=md):
@@ -165,19 +255,21 @@ def _show_help(app, size, level, sh_code, as_md, h):
         return '\n'.join([classic(row) for row in l[1:]])
 
     header(app)
+    # the configured values (the attrs defaults are the same for all configure
+    # runs, see plan.py):
+    values = getattr(app, '_values_', {})
     for attr in app.__attrs_attrs__:
         n = attr.name
         m = attr.metadata
         descr = m.get('descr', '')
         long_descr = m.get('long_descr', '')
         prov, default = m.get('provider') or ' ', m.get('orig') or ''
-        v = attr.default
+        v = values.get(n, attr.default)
         if str(v).startswith('req:<'):
             default = ('<%s' % v[5:]).upper()
             v = '!'
-        if hasattr(v, 'factory'):
-            inn = getattr(app, n)
-            ap(inner, _show_help(inn, size, level - 1, sh_code, as_md, h=2))
+        if is_cls(v) or hasattr(v, 'factory'):
+            ap(inner, n)
         else:
             t = attr.type
             if n == 'xb_dflt_True':
@@ -231,12 +323,14 @@ def _show_help(app, size, level, sh_code, as_md, h):
         ap(md, hl('Actions', h + 1))
         [func(*f) for f in funcs]
 
-    [ap(md, '\n---\n' + p) for p in inner]
-    pr, po = '', ''
+    yield ('\n' if h == 1 else '') + '\n'.join(md)
+    for n in inner if level > 0 else ():
+        yield '\n\n---\n'
+        inn = getattr(app, n)
+        for sect in sections(inn, size, level - 1, sh_code, as_md, h=2):
+            yield sect
     if h == 1:
-        pr += '\n'
-        po += '\n'
-    return pr + '\n'.join(md) + po
+        yield '\n'
 
 
 def remove_doc(func, src, ind):
@@ -0,0 +1,210 @@
+"""
+Compiled App class trees ("plans").
+
+configure has two jobs: Introspecting the class tree (dir, getattr, signature,
+caster lookups) and resolving the values of the providers against it.
+The first job we do here, once - the result is reusable for any number of
+configure runs:
+
+    plan = devapps.compile(App)
+    App1, func1 = plan.configure(providers1)
+    App2, func2 = plan.configure(providers2)
+
+The user's classes are never changed, configure builds derived classes:
+
+- per plan and "provider shape" (which attrs got values from which provider)
+  one attrs class, generated once, then cached.
+- per configure run a plain subclass of it, carrying the values (_values_),
+  the do_ functions with defaults changed by providers and its plan (_plan_).
+"""
+from __future__ import absolute_import, print_function
+import copy
+from functools import partial
+
+from .casting import attr, cast, t_attr, by_value
+from .func_sigs import binding
+from .scan import inventory, class_attrs, is_inner
+
+# fmt: off
+# the kinds of attrs within a class plan:
+k_func  = 'func'   # a do_ function (action)
+k_attr  = 'attr'   # given as attr.ib by the user
+k_val   = 'val'    # a value. E.g. some_bool = True
+k_type  = 'type'   # a type, no value. E.g. some_bool = bool
+k_inner = 'inner'  # a nested class
+# fmt: on
+
+# max_plans: compiled Apps kept (plans hold their classes, so no weak refs)
+# max_shapes: generated attrs classes kept per class plan
+CFG = {'max_plans': 100, 'max_shapes': 64}
+
+
+def bounded(d, n):
+    """Drops the oldest entries of dict d down to n - 1, for one more"""
+    while len(d) >= n:
+        d.pop(next(iter(d)))
+
+
+def attr_plan(l, path, inv):
+    """The plan for one class attr, a tuple:
+    (name, value, type, is_func, kind, caster).
+    caster for functions is their Binding, for inner classes their plan.
+    """
+    k, v, t, ft = l
+    if ft:
+        return k, v, t, ft, k_func, binding(v, 1)
+    if t == t_attr:
+        d = v._default
+        typ = v.type or (d if by_value(d) else type(d))
+        return k, v, t, ft, k_attr, cast.bind(typ)
+    if t != type:
+        # array('d') casts different than array('q'), dicts by schema:
+        return k, v, t, ft, k_val, cast.bind(v if by_value(v) else t)
+    if not is_inner(l):
+        return k, v, t, ft, k_type, cast.get(v)
+    return k, v, t, ft, k_inner, class_plan(v, path + (k,), inv)
+
+
+def class_plan(cls, path, inv):
+    c = inv['.'.join(path)]
+    attrs = [attr_plan(l, path, inv) for l in class_attrs(cls, c) if l]
+    shorts = c['shorts']
+    return ClassPlan(
+        cls=cls,
+        path=path,
+        attrs=tuple(attrs),
+        shorts=shorts,
+        short_keys=tuple(sorted(shorts)) if shorts else None,
+        collisions=c.get('collisions'),
+        stamp=stamp(cls),
+    )
+
+
+def stamp(cls):
+    """Changes when (public) attrs of the class are set or deleted (runtime)"""
+    mro = cls.__mro__[:-1] if hasattr(cls, '__mro__') else (cls,)
+    return tuple(
+        [
+            (k, id(v))
+            for c in mro
+            for k, v in c.__dict__.items()
+            if not k.startswith('_')
+        ]
+    )
+
+
+def value_of(k, obj):
+    return obj._values_[k]
+
+
+def new_inner(k, obj):
+    return obj._values_[k]()
+
+
+@attr.s(frozen=True)
+class ClassPlan(object):
+    """All we need to know about one class of the tree"""
+
+    cls = attr.ib()
+    path = attr.ib()
+    # the attr plans (see attr_plan):
+    attrs = attr.ib()
+    # map of short forms to attr names
+    shorts = attr.ib()
+    # its keys, sorted - for the prefix matching:
+    short_keys = attr.ib(repr=False)
+    # colliding short forms -> their attr names:
+    collisions = attr.ib(repr=False)
+    stamp = attr.ib(repr=False)
+    # the generated attrs classes, by provider shape:
+    classes = attr.ib(factory=dict, repr=False, eq=False)
+
+    def derive(cp, provs, values, funcs):
+        """The configured class.
+        provs: tuple of the providers (names) of the attrs' values
+        values: the values of the attrs set by providers, the inner classes
+        funcs: do_ functions with modified defaults
+        """
+        C = cp.classes.get(provs)
+        if C is None:
+            bounded(cp.classes, CFG['max_shapes'])
+            C = cp.classes[provs] = cp.build(provs, values)
+        ns = dict(funcs)
+        ns['_values_'] = values
+        ns['_plan_'] = cp
+        return type(cp.cls.__name__, (C,), cp.ns(ns))
+
+    def ns(cp, ns):
+        cls = cp.cls
+        ns['__module__'] = cls.__module__
+        ns['__doc__'] = cls.__doc__
+        if hasattr(cls, '__qualname__'):
+            ns['__qualname__'] = cls.__qualname__
+        return ns
+
+    def build(cp, provs, values):
+        """Generating the attrs class for a provider shape.
+        Values not from providers are the same in all configure runs,
+        we take them as defaults, the others are read from _values_.
+        """
+        ns = {'_path': cp.path}
+        attrs = [l for l in cp.attrs if l[4] != k_func]
+        for l, prov in zip(attrs, provs):
+            k, v, kind = l[0], l[1], l[4]
+            dflt = attr.Factory(partial(value_of, k), takes_self=True)
+            if kind == k_attr:
+                a = copy.copy(v)
+                a.metadata = dict(v.metadata)
+                if prov:
+                    a._default = dflt
+            elif kind == k_inner:
+                a = attr.ib(attr.Factory(partial(new_inner, k), True))
+            else:
+                a = attr.ib(dflt if prov else values[k])
+            a.metadata['orig'] = v
+            a.metadata['provider'] = prov
+            ns[k] = a
+        return attr.s(type(cp.cls.__name__, (cp.cls,), cp.ns(ns)))
+
+
+@attr.s(frozen=True)
+class Plan(object):
+    """The compiled class tree of an App"""
+
+    App = attr.ib()
+    root = attr.ib()
+
+    def configure(plan, providers=None, **kw):
+        """Resolves the values of the providers against the plan.
+        Returns the configured App class and the function to run
+        (see devapps.configure for the keyword args).
+        """
+        from devapps import configure_plan
+
+        return configure_plan(plan, providers, **kw)
+
+
+def compile(App):
+    """Introspects the App class tree once, into a reusable Plan"""
+    return Plan(App=App, root=class_plan(App, (), inventory(App)))
+
+
+# App -> Plan, least recently used first:
+plans = {}
+
+
+def unchanged(cp):
+    if stamp(cp.cls) != cp.stamp:
+        return False
+    return all([unchanged(l[5]) for l in cp.attrs if l[4] == k_inner])
+
+
+def compiled(App):
+    """The plan for App, compiled only once per process
+    (unless the classes of the tree are changed at runtime)"""
+    plan = plans.pop(App, None)
+    if plan is None or not unchanged(plan.root):
+        bounded(plans, CFG['max_plans'])
+        plan = compile(App)
+    plans[App] = plan
+    return plan
@@ -0,0 +1,237 @@
+"""
+Scanning of App class trees - with the results cached on disk.
+
+configure needs, per class of the tree, the public attrs, the do_ functions, the
+nested classes and the short forms of the attr names. Getting this means
+dir(cls) and getattr on all(!) cls attrs, recursively.
+
+We keep that inventory (names only - values we take from the classes) in
+user_config_dir(), keyed by a hash over the sources of the tree and the
+devapps version. Changed sources invalidate it. Hashing we only do for
+files with an mtime or size differing from the stored ones.
+"""
+from __future__ import absolute_import, print_function
+import os
+import sys
+import zlib
+
+from .version import __version__
+from .casting import cast, t_funcs
+from .common import debug, cache_dir
+
+# dir: where we store the inventories. None: below user_config_dir()
+# enabled: can be switched off per App as well, via App._scan_cache = False
+# max_files: per cache dir, the least recently written ones beyond are removed
+CFG = {'dir': None, 'enabled': True, 'max_files': 500}
+
+
+def nfo(cls, k):
+    """(name, value, type, is a (do) function) of a class attr
+    None for functions not starting with do_ (which are no actions)
+    """
+    v = getattr(cls, k)
+    t = type(v)
+    ft = t in t_funcs
+    if ft:
+        if not k.startswith('do_'):
+            return
+        k = k[3:]
+    return k, v, t, ft
+
+
+def is_inner(l):
+    """nfo tuple of a nested class (and not a type, which we can cast into)"""
+    return l and l[2] == type and not cast.get(l[1])
+
+
+def fingerprint(cls):
+    """Over the public names within the class and its bases (not the values).
+    Cheap enough to detect classes modified at runtime (setattr), which a
+    hash over the source can't.
+    """
+    names = []
+    for c in cls.__mro__[:-1] if hasattr(cls, '__mro__') else (cls,):
+        names.extend([k for k in c.__dict__ if not k.startswith('_')])
+    return zlib.crc32('\0'.join(names).encode('utf-8'))
+
+
+def src_file(cls):
+    mod = sys.modules.get(cls.__module__)
+    fn = getattr(mod, '__file__', None)
+    if not fn:
+        return
+    if fn.endswith(('.pyc', '.pyo')):
+        fn = fn[:-1]
+    return os.path.abspath(fn)
+
+
+def file_stat(fn):
+    try:
+        st = os.stat(fn)
+    except OSError:
+        return
+    return [getattr(st, 'st_mtime_ns', st.st_mtime), st.st_size]
+
+
+def file_state(fn):
+    """[sha1, mtime, size] of fn (stat first: changed while hashing, we
+    hash again next time)"""
+    st = file_stat(fn) or [None, None]
+    return [file_hash(fn)] + st
+
+
+def file_hash(fn):
+    import hashlib
+
+    try:
+        with open(fn, 'rb') as fd:
+            return hashlib.sha1(fd.read()).hexdigest()
+    except Exception:
+        return
+
+
+def scan_cls(cls, path, inv, files):
+    """Building the inventory of cls and, recursively, of its inner classes"""
+    from devapps import to_shorts
+
+    attrs = [nfo(cls, k) for k in dir(cls) if not k.startswith('_')]
+    attrs = [l for l in attrs if l]
+    # we complain about collisions only when such a short is used, i.e. later,
+    # at configure time:
+    collisions = {}
+    shorts = to_shorts([l[0] for l in attrs], collisions=collisions)
+    inner = [l[0] for l in attrs if is_inner(l)]
+    inv['.'.join(path)] = {
+        'attrs': [('do_' + l[0]) if l[3] else l[0] for l in attrs],
+        'funcs': [l[0] for l in attrs if l[3]],
+        'inner': inner,
+        'shorts': shorts,
+        'collisions': collisions,
+        'fp': fingerprint(cls),
+    }
+    fn = src_file(cls)
+    if fn and fn not in files:
+        files[fn] = file_state(fn)
+    for k in inner:
+        scan_cls(getattr(cls, k), path + (k,), inv, files)
+    return inv
+
+
+def cache_file(App, fn):
+    """fn: source file of App. Part of the name, since all scripts run
+    have __main__ as module name"""
+    n = '%s.%s' % (App.__module__, getattr(App, '__qualname__', App.__name__))
+    n = n.replace('<', '').replace('>', '').replace(os.sep, '_')
+    n += '.%x' % zlib.crc32(fn.encode('utf-8'))
+    return os.path.join(cache_dir(CFG, 'scan'), n + '.json')
+
+
+def valid(App, stored):
+    """Stored inventory still matching sources, devapps and the classes?"""
+    if not stored or stored.get('version') != __version__:
+        return False
+    for fn, st in stored['files'].items():
+        if not isinstance(st, list) or not st[0]:
+            return False
+        if file_stat(fn) == st[1:]:
+            continue
+        if file_hash(fn) != st[0]:
+            return False
+        # touched only. Storing the new stat spares the hashing next time:
+        st[1:] = file_stat(fn) or [None, None]
+        stored['touched'] = True
+    classes = stored['classes']
+    todo = [(App, '')]
+    while todo:
+        cls, pth = todo.pop()
+        c = classes.get(pth)
+        if not c or c['fp'] != fingerprint(cls):
+            return False
+        for k in c['inner']:
+            v = getattr(cls, k, None)
+            if v is None:
+                return False
+            todo.append((v, (pth + '.' + k) if pth else k))
+    return True
+
+
+def load(fn):
+    import json
+
+    try:
+        with open(fn) as fd:
+            return json.loads(fd.read())
+    except Exception:
+        return
+
+
+def store(fn, inv):
+    import json
+
+    try:
+        d = os.path.dirname(fn)
+        if not os.path.exists(d):
+            os.makedirs(d)
+        new = not os.path.exists(fn)
+        # atomic, concurrent configures (cron) may read it:
+        tmp = '%s.%s' % (fn, os.getpid())
+        with open(tmp, 'w') as fd:
+            fd.write(json.dumps(inv))
+        os.rename(tmp, fn)
+    except Exception as ex:
+        debug('Cannot store cache file', fn=fn, exc=ex)
+        return
+    if new:
+        prune(d, CFG['max_files'])
+
+
+def mtime(fn):
+    try:
+        return os.stat(fn).st_mtime
+    except OSError:
+        return 0
+
+
+def prune(d, keep):
+    """Removes the least recently written cache files in d beyond keep
+    (files of removed or renamed apps, of old versions, help of other widths)
+    """
+    try:
+        fns = [n for n in os.listdir(d) if n.endswith('.json')]
+    except OSError:
+        return
+    if len(fns) <= keep:
+        return
+    fns = sorted([os.path.join(d, n) for n in fns], key=mtime)
+    for fn in fns[: len(fns) - keep]:
+        try:
+            os.unlink(fn)
+        except OSError as ex:
+            debug('Cannot remove cache file', fn=fn, exc=ex)
+
+
+def inventory(App):
+    """The per class path ('' for App itself, 'inner.deep' for nested) infos:
+    attr names, do_ functions, inner classes, shorts map, colliding shorts.
+    """
+    use = CFG['enabled'] and getattr(App, '_scan_cache', True)
+    fn = src_file(App) if use else None
+    if fn:
+        fn = cache_file(App, fn)
+        stored = load(fn)
+        if valid(App, stored):
+            if stored.pop('touched', None):
+                store(fn, stored)
+            return stored['classes']
+    files = {}
+    inv = scan_cls(App, (), {}, files)
+    if fn:
+        store(fn, {'version': __version__, 'files': files, 'classes': inv})
+    return inv
+
+
+def class_attrs(cls, c):
+    """The nfo tuples of a class, from its inventory entry c
+    (values are always taken from the class itself)
+    """
+    return [nfo(cls, k) for k in c['attrs']]
@@ -0,0 +1,401 @@
+"""
+Resident app server, on a Unix socket.
+
+    devapp --serve [--socket /tmp/calc/s.sock] ./calc.py &
+    python -S <path to this file> /tmp/calc/s.sock of=mul 2 3
+
+The server imports the app module and compiles the class tree once. Per
+request it forks (see fork, for the gc): the child gets the client's argv,
+environment, cwd and its stdin, stdout and stderr (the fds, passed over the
+socket) and runs the app exactly like `devapp ./calc.py ...` would, i.e.
+configure (CLI, Env and File providers) and call. The client only waits for
+the exit code.
+
+This module is also the client: Run as a script it imports only stdlib
+modules (json, socket), not devapps - start it with python -S.
+
+launch forks as well, for many runs from within one process: argv lists in,
+results out. There the parent configured all but the CLI already.
+
+Protocol: Frames of a 4 byte (big endian) length and a JSON body.
+The request frame carries the client's fds 0, 1, 2 as SCM_RIGHTS.
+Since it carries the environ and the terminal as well, the client talks only
+to servers of its own user (owner of the socket, SO_PEERCRED) and sockets
+are put into a directory private to the user (see socket_dir).
+
+    request:  {"argv": [..], "env": {..}, "cwd": ".."}
+    response: {"exit": <code>}
+"""
+from __future__ import absolute_import, print_function
+import array
+import errno
+import json
+import os
+import socket
+import stat
+import struct
+import sys
+
+# dir: where sockets are put by default. None: $XDG_RUNTIME_DIR, else
+# devapps-<uid> in the system's temp dir. Must be ours, mode 0700.
+CFG = {'dir': None}
+
+
+def not_ours(path):
+    """Why path (dir or socket) is not ours alone - None if it is"""
+    try:
+        st = os.lstat(path)
+    except OSError as ex:
+        return str(ex)
+    if st.st_uid != os.getuid():
+        return 'owned by uid %s' % st.st_uid
+    if stat.S_ISLNK(st.st_mode):
+        return 'a symlink'
+    if st.st_mode & 0o077:
+        return 'mode %o, accessible by others' % (st.st_mode & 0o777)
+
+
+def socket_dir():
+    d = CFG['dir']
+    if d is None:
+        d = os.environ.get('XDG_RUNTIME_DIR')
+        if not d or not_ours(d):
+            import tempfile
+
+            d = os.path.join(tempfile.gettempdir(), 'devapps-%s' % os.getuid())
+            try:
+                os.mkdir(d, 0o700)
+            except OSError as ex:
+                if ex.errno != errno.EEXIST:
+                    raise
+    why = not_ours(d)
+    if why:
+        from .common import Exc, throw
+
+        throw(Exc.not_private, dir=d, why=why)
+    return d
+
+
+def socket_path(prog):
+    return os.path.join(socket_dir(), 'devapps.%s.sock' % prog)
+
+
+def peer_uid(sock):
+    """uid of the process at the other end, None if not known (no Linux)"""
+    opt = getattr(socket, 'SO_PEERCRED', None)
+    if opt is None:
+        return
+    n = struct.calcsize('3i')
+    return struct.unpack('3i', sock.getsockopt(socket.SOL_SOCKET, opt, n))[1]
+
+
+def recv_exact(sock, n):
+    b = b''
+    while len(b) < n:
+        r = sock.recv(n - len(b))
+        if not r:
+            return
+        b += r
+    return b
+
+
+def send(sock, msg, fds=()):
+    b = json.dumps(msg).encode('utf-8')
+    b = struct.pack('>I', len(b)) + b
+    anc = []
+    if fds:
+        anc = [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array('i', fds))]
+    n = sock.sendmsg([b], anc)
+    if n < len(b):
+        sock.sendall(b[n:])
+
+
+def recv(sock, max_fds=0):
+    """The next frame's message and the fds sent with it.
+    None if the peer closed"""
+    fds = array.array('i')
+    n = socket.CMSG_SPACE(max_fds * fds.itemsize) if max_fds else 0
+    head, anc = sock.recvmsg(4, n)[:2]
+    for lvl, typ, data in anc:
+        if lvl == socket.SOL_SOCKET and typ == socket.SCM_RIGHTS:
+            fds.frombytes(data[: len(data) - len(data) % fds.itemsize])
+    if head and len(head) < 4:
+        head += recv_exact(sock, 4 - len(head)) or b''
+    if len(head) < 4:
+        return None, list(fds)
+    body = recv_exact(sock, struct.unpack('>I', head)[0])
+    if body is None:
+        return None, list(fds)
+    return json.loads(body.decode('utf-8')), list(fds)
+
+
+def client(path, argv):
+    """Forwards argv, environ, cwd and fds 0-2 to the server, returns its
+    exit code"""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        st = os.lstat(path)
+        sock.connect(path)
+    except (OSError, IOError) as ex:
+        print('No server at %s: %s' % (path, ex), file=sys.stderr)
+        return 1
+    # our environ and terminal we hand to our own servers only:
+    for u in st.st_uid, peer_uid(sock):
+        if u is not None and u != os.getuid():
+            sock.close()
+            msg = 'Not connecting to %s: server of uid %s' % (path, u)
+            print(msg, file=sys.stderr)
+            return 1
+    req = {'argv': list(argv), 'env': dict(os.environ), 'cwd': os.getcwd()}
+    send(sock, req, fds=(0, 1, 2))
+    res = recv(sock)[0]
+    sock.close()
+    return 1 if res is None else res['exit']
+
+
+def handle(conn, run):
+    """In the forked child: Takes over the client's process state, runs"""
+    code = 1
+    try:
+        req, fds = recv(conn, 3)
+        if req is None:
+            return code
+        for i, fd in enumerate(fds):
+            os.dup2(fd, i)
+            os.close(fd)
+        os.environ.clear()
+        os.environ.update(req['env'])
+        os.chdir(req['cwd'])
+        try:
+            run(req['argv'])
+            code = 0
+        except SystemExit as ex:
+            c = ex.code
+            code = c if isinstance(c, int) else (0 if c is None else 1)
+        except BaseException as ex:
+            if getattr(ex, 'errno', None) != errno.EPIPE:
+                import traceback
+
+                traceback.print_exc()
+    finally:
+        flush()
+        try:
+            send(conn, {'exit': code})
+        except Exception:
+            pass
+    return code
+
+
+def flush():
+    for s in sys.stdout, sys.stderr:
+        try:
+            s.flush()
+        except Exception:
+            pass
+
+
+def serve(path, run, backlog=128):
+    """Runs run(argv) in a forked child per connection on socket path"""
+    import gc
+    import signal
+    from .common import info
+
+    # clients see the path only once we listen:
+    tmp = '%s.%s' % (path, os.getpid())
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(tmp)
+    os.chmod(tmp, 0o600)
+    sock.listen(backlog)
+    os.rename(tmp, path)
+    # children report to their clients, no one waits for them:
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    info('Serving', socket=path, pid=os.getpid())
+    gc.collect()
+    try:
+        while True:
+            conn = sock.accept()[0]
+            if fork() == 0:
+                # never back into this loop (or its finally):
+                code = 1
+                try:
+                    # the app's own children we must be able to wait for:
+                    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                    sock.close()
+                    code = handle(conn, run)
+                finally:
+                    os._exit(code)
+            conn.close()
+    finally:
+        sock.close()
+        os.unlink(path)
+
+
+def fork():
+    """os.fork, all objects moved into the permanent gc generation before:
+    The child's collector then leaves them alone - and so the pages it shares
+    with us. Only the child keeps them there, our gc state is restored.
+    """
+    import gc
+
+    sys.stdout.flush()
+    sys.stderr.flush()
+    enabled = gc.isenabled()
+    gc.disable()
+    frz = hasattr(gc, 'freeze')  # py >= 3.7
+    if frz:
+        gc.freeze()
+    pid = -1
+    try:
+        pid = os.fork()
+    finally:
+        if frz and pid != 0:
+            gc.unfreeze()
+        if enabled:
+            gc.enable()
+    return pid
+
+
+def run_item(plan, shared, argv, req_args_complete, log_err, log):
+    """In the forked child: CLI overrides on top of the shared providers"""
+    from . import cli_prov, resolve
+    from .common import Exc, throw
+
+    cli = cli_prov(plan.App, argv)
+    provs = [[cli, cli.cfg(), cli.str_only]] + shared
+    C, func = resolve(plan, provs, req_args_complete, log_err, log)
+    if func is None:
+        throw(Exc.cannot_determine_function, argv=argv)
+    return func(C())
+
+
+def child(w, *a):
+    import pickle
+
+    try:
+        res = (run_item(*a), None)
+    except Exception as ex:
+        res = (None, ex)
+    try:
+        b = pickle.dumps(res, -1)
+    except Exception as ex:
+        b = pickle.dumps((None, Exception('Cannot pickle', repr(ex))), -1)
+    with os.fdopen(w, 'wb') as fd:
+        fd.write(b)
+    return 1 if res[1] else 0
+
+
+def launch(
+    App,
+    argv_list,
+    jobs=None,
+    providers=None,
+    req_args_complete=True,
+    log_err=False,
+    log=None,
+    stdout=None,
+):
+    """Runs App for every argv (list of CLI args) of argv_list, each in a
+    child forked from this process, jobs (default: cpus) at a time.
+    Yields (i, result, exception) as the children finish. stdout: the fd
+    the children write their stdout to (e.g. 2), default: ours.
+
+    Configured once, in this process: The class tree, the values of the
+    providers (default: Env and File of the App), the classes and casters
+    for the first argv. Children are forked with the gc frozen (see fork),
+    so they do not write to the pages they share with us. A child only casts
+    its CLI args and runs.
+    Results and exceptions are pickled back.
+    """
+    import gc
+    from itertools import chain
+    from . import cli_prov, compiled, common, resolve, read_providers
+    from . import Env, File
+
+    common.set_log(log)
+    plan = compiled(App)
+    if providers is None:
+        providers = (Env(App.__name__), File(App))
+    shared = read_providers(providers)
+    argvs = iter(argv_list)
+    first = next(argvs, None)
+    if first is None:
+        return
+    # warm up with the first item, quietly - its errors are for its child:
+    lvl, common.CFG['min_level'] = common.CFG['min_level'], 100
+    try:
+        cli = cli_prov(App, first)
+        provs = [[cli, cli.cfg(), cli.str_only]] + shared
+        resolve(plan, provs, req_args_complete, False, log)
+    except Exception:
+        pass
+    finally:
+        common.CFG['min_level'] = lvl
+    # no garbage of the warm up in the children's shared pages:
+    gc.collect()
+    jobs = jobs or common.cpu_count()
+    args = (req_args_complete, log_err, log)
+    items, running = enumerate(chain([first], argvs)), {}
+    try:
+        for r in results(items, running, jobs, plan, shared, args, stdout):
+            yield r
+    finally:
+        # closed early: no zombies
+        for r, (i, pid, bufs) in running.items():
+            os.close(r)
+            reap(pid)
+
+
+def reap(pid):
+    try:
+        os.waitpid(pid, 0)
+    except OSError as ex:
+        # only when the caller ignores SIGCHLD (reaped by the system):
+        if ex.errno != errno.ECHILD:
+            raise
+
+
+def results(items, running, jobs, plan, shared, args, stdout=None):
+    import pickle
+    import select
+
+    while True:
+        while len(running) < jobs:
+            i, argv = next(items, (None, None))
+            if i is None:
+                break
+            r, w = os.pipe()
+            pid = fork()
+            if pid == 0:
+                code = 1
+                try:
+                    os.close(r)
+                    if stdout is not None:
+                        os.dup2(stdout, 1)
+                    code = child(w, plan, shared, argv, *args)
+                finally:
+                    flush()
+                    os._exit(code)
+            os.close(w)
+            running[r] = [i, pid, []]
+        if not running:
+            return
+        for r in select.select(list(running), [], [])[0]:
+            b = os.read(r, 1 << 16)
+            if b:
+                running[r][2].append(b)
+                continue
+            os.close(r)
+            i, pid, bufs = running.pop(r)
+            reap(pid)
+            try:
+                res, ex = pickle.loads(b''.join(bufs))
+            except Exception as e:
+                # child died w/o result (killed, os._exit in the app)
+                res, ex = None, Exception('No result', repr(e))
+            yield i, res, ex
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        sys.exit('Usage: %s <socket> [app args]' % sys.argv[0])
+    sys.exit(client(sys.argv[1], sys.argv[2:]))
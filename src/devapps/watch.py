@@ -0,0 +1,213 @@
+"""
+Watching config files, applying changes to running apps.
+
+    app = App()  # configured, e.g. with a File provider f
+    watcher = f.watch(app, callback)
+    (...)
+    watcher.stop()
+
+On changes of the file we diff the old and new parsed trees and set only the
+changed leaves on the app instance (and its inner ones), cast as at configure
+time - no walk_attrs run. As at configure, values of other providers (CLI,
+Env) have precedence, those we leave as they are. Changed function defaults
+({'run': {'a': 1}}) we report but do not apply - the functions are on the
+classes.
+
+Change detection is by inotify (via ctypes, Linux), else by os.stat polling.
+The callback, callback(app, changed), is run in the watcher's thread, with
+the key paths (tuples) of all changed leaves.
+"""
+from __future__ import absolute_import, print_function
+import os
+import select
+import struct
+import threading
+from copy import deepcopy
+
+from .casting import attr, by_value
+from .common import nil, debug, error
+from .plan import k_attr, k_val, k_type
+
+# inotify event masks (linux/inotify.h):
+IN_CLOSE_WRITE, IN_MOVED_TO, IN_CLOEXEC = 0x8, 0x80, 0o2000000
+
+
+def diff(old, new, pth=()):
+    """The key paths of the leaves differing between the trees.
+    Removed or added sub trees count as changes of all their leaves.
+    """
+    o, n = isinstance(old, dict), isinstance(new, dict)
+    if not o and not n:
+        return [] if old == new else [pth]
+    if (not o and old is not nil) or (not n and new is not nil):
+        # leaf vs tree:
+        return [pth]
+    old, new = old if o else {}, new if n else {}
+    r = []
+    for k in list(old) + [k for k in new if k not in old]:
+        r.extend(diff(old.get(k, nil), new.get(k, nil), pth + (k,)))
+    return r
+
+
+def get_path(d, pth):
+    for k in pth:
+        if not isinstance(d, dict):
+            return nil
+        d = d.get(k, nil)
+    return d
+
+
+def default(l, obj):
+    """The value of attr plan l when not given by any provider"""
+    v, kind = l[1], l[4]
+    if kind == k_val:
+        return deepcopy(v)
+    if kind == k_attr:
+        d = v._default
+        if isinstance(d, attr.Factory):
+            return d.factory(obj) if d.takes_self else d.factory()
+        return deepcopy(d)
+    return nil
+
+
+def set_leaf(app, pth, val, provider, str_only):
+    """Sets the value at key path pth on the app or its inner instance.
+    Returns False when not applicable (unknown, function, overridden)"""
+    obj = app
+    for k in pth[:-1]:
+        obj = getattr(obj, k, None)
+    cp, k = getattr(type(obj), '_plan_', None), pth[-1]
+    l = [l for l in cp.attrs if l[0] == k] if cp else None
+    if not l or l[0][4] not in (k_attr, k_val, k_type):
+        return False
+    l, field = l[0], attr.fields_dict(type(obj))[k]
+    if field.metadata.get('provider') not in (None, provider):
+        return False
+    if val is nil:
+        val = default(l, obj)
+        if val is nil:
+            error('Removed value is required', key='.'.join(pth))
+            return False
+    elif str_only or by_value(l[1]._default if l[4] == k_attr else l[1]):
+        caster = l[5]
+        val = caster(val, l[1], {}) if l[4] == k_type else caster(val)
+    if field.converter:
+        val = field.converter(val)
+    if field.validator:
+        field.validator(obj, field, val)
+    setattr(obj, k, val)
+    return True
+
+
+def apply(app, old, new, provider='File', str_only=False):
+    """Sets the changed leaves on app, returns the changed key paths"""
+    changed = diff(old, new)
+    for pth in changed:
+        try:
+            if set_leaf(app, pth, get_path(new, pth), provider, str_only):
+                continue
+            debug('Change not applied', key='.'.join(pth))
+        except Exception as ex:
+            error('Cannot apply change', key='.'.join(pth), exc=ex)
+    return changed
+
+
+def inotify(fn):
+    """fd of an inotify instance watching the directory of fn (editors
+    replace files). None if not available."""
+    try:
+        import ctypes
+
+        libc = ctypes.CDLL(None, use_errno=True)
+        fd = libc.inotify_init1(IN_CLOEXEC)
+        if fd < 0:
+            return
+        d = os.path.dirname(fn).encode('utf-8')
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO
+        if libc.inotify_add_watch(fd, d, mask) < 0:
+            os.close(fd)
+            return
+        return fd
+    except Exception as ex:
+        debug('No inotify', exc=ex)
+
+
+def event_names(buf):
+    """The file names within a read of inotify events"""
+    r, i = [], 0
+    while i + 16 <= len(buf):
+        l = struct.unpack_from('iIII', buf, i)[3]
+        r.append(buf[i + 16 : i + 16 + l].rstrip(b'\0'))
+        i += 16 + l
+    return r
+
+
+def stat(fn):
+    try:
+        st = os.stat(fn)
+    except OSError:
+        return
+    return st.st_ino, getattr(st, 'st_mtime_ns', st.st_mtime), st.st_size
+
+
+class Watcher(object):
+    """Watches the file of a File provider, applies changes to app"""
+
+    def __init__(w, file, app, callback=None, interval=1.0, poll=False):
+        w.file, w.app, w.callback = file, app, callback
+        w.interval, w.poll = interval, poll
+        w.fn = file.filename
+        w.stamp = stat(w.fn)
+        w.stopped = threading.Event()
+        w.fd = None if poll else inotify(w.fn)
+        w.thread = threading.Thread(target=w.run, name='watch ' + w.fn)
+        w.thread.daemon = True
+
+    def start(w):
+        w.thread.start()
+        return w
+
+    def stop(w):
+        w.stopped.set()
+        w.thread.join()
+
+    def __enter__(w):
+        return w
+
+    def __exit__(w, *exc):
+        w.stop()
+
+    def run(w):
+        name = os.path.basename(w.fn).encode('utf-8')
+        try:
+            while not w.stopped.is_set():
+                if w.fd is None:
+                    w.stopped.wait(w.interval)
+                    w.check()
+                    continue
+                if select.select([w.fd], [], [], w.interval)[0]:
+                    if name in event_names(os.read(w.fd, 65536)):
+                        w.check()
+        finally:
+            if w.fd is not None:
+                os.close(w.fd)
+                w.fd = None
+
+    def check(w):
+        """Reloads the file if it changed, applies the changes"""
+        from devapps import read_cfg_file
+
+        stamp = stat(w.fn)
+        if stamp is None or stamp == w.stamp:
+            return
+        w.stamp, file = stamp, w.file
+        try:
+            new = read_cfg_file(w.fn, file.filetype)
+        except Exception as ex:
+            # e.g. written partially, we'll get another event:
+            error('Cannot load changed file', fn=w.fn, exc=ex)
+            return
+        changed = apply(w.app, file._cfg, new, 'File', file.str_only)
+        file._cfg = new
+        if changed and w.callback:
+            w.callback(w.app, changed)
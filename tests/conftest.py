@@ -0,0 +1,26 @@
+import os
+
+import pytest
+
+from devapps import common
+
+
+@pytest.fixture(scope='session', autouse=True)
+def config_home(tmpdir_factory):
+    # the caches (scan, help, completion) of the test runs, also those of
+    # their subprocesses, not into the user's config dir:
+    old = os.environ.get('XDG_CONFIG_HOME')
+    d = os.environ['XDG_CONFIG_HOME'] = str(tmpdir_factory.mktemp('config'))
+    yield d
+    if old is None:
+        del os.environ['XDG_CONFIG_HOME']
+    else:
+        os.environ['XDG_CONFIG_HOME'] = old
+
+
+@pytest.fixture
+def clean_log_cfg():
+    # configure populates the logger, which other tests assume to be clean:
+    cfg = dict(common.CFG)
+    yield
+    common.CFG = cfg
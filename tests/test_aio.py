@@ -0,0 +1,99 @@
+"""
+Coroutine and async generator actions, async provider cfg()s
+"""
+import sys
+
+import pytest
+
+if sys.version_info < (3, 7):
+    pytest.skip('asyncio.run: py >= 3.7', allow_module_level=True)
+
+import asyncio
+import devapps
+from devapps.app import app
+
+
+# configure populates the logger (see conftest):
+pytestmark = pytest.mark.usefixtures('clean_log_cfg')
+
+
+class Slow(devapps.Provider):
+    active = []
+
+    def __init__(p, cfg, dt=0.2):
+        p.d, p.dt = cfg, dt
+
+    async def cfg(p):
+        Slow.active.append(len(Slow.active) + 1)
+        await asyncio.sleep(p.dt)
+        Slow.active.append(Slow.active[-1] - 1)
+        return p.d
+
+
+class App:
+    a = 1
+    b = 2
+
+    async def do_run(app, x=0):
+        await asyncio.sleep(0)
+        return app.a + app.b + x
+
+    async def do_count(app, n=3):
+        for i in range(n):
+            yield i
+
+
+def test_actions():
+    A, run = devapps.configure(App, devapps.CLI(['x=1']))
+    assert run(A()) == 4
+    A, run = devapps.configure(App, devapps.CLI(['count', 'n=2']))
+    assert run(A()) == [0, 1]
+
+
+def test_within_loop():
+    async def main():
+        A, run = devapps.configure(App, [devapps.CLI(['count']), Slow({})])
+        return await run(A())
+
+    assert asyncio.run(main()) == [0, 1, 2]
+
+
+def test_running_py36(monkeypatch):
+    # py3.6 has no asyncio.get_running_loop:
+    from devapps import aio
+
+    monkeypatch.delattr(asyncio, 'get_running_loop')
+    assert not aio.running()
+    test_within_loop()
+
+
+def test_providers_concurrent():
+    del Slow.active[:]
+    provs = [devapps.CLI([]), Slow({'a': 10}), Slow({'b': 20, 'a': 0})]
+    A, run = devapps.configure(App, provs)
+    # the second started before the first was done:
+    assert Slow.active == [1, 2, 1, 0]
+    assert run(A()) == 30
+
+
+def test_app_prints(capsys):
+    app(imp_name='__main__', cli_argv=['count', 'n=2'])(App)
+    assert capsys.readouterr().out == '[0, 1]\n'
+
+
+def test_app_prints_within_loop(capsys):
+    async def main():
+        return app(imp_name='__main__', cli_argv=['count', 'n=2'])(App)
+
+    assert asyncio.run(main()) == [0, 1]
+    assert capsys.readouterr().out == '[0, 1]\n'
+
+
+def test_action_graph():
+    class G(App):
+        @devapps.needs('run')
+        async def do_twice(app, run):
+            return 2 * run
+
+    A, run = devapps.configure(G, devapps.CLI(['twice', 'count']))
+    assert run(A()) == {'twice': 6, 'count': [0, 1, 2]}
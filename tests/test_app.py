@@ -41,3 +41,96 @@ def test_deco_no_args(capsys):
         # we populated the logger, i.e. changed global state:
         # which other tests assume to be clean:
         common.CFG = cfg
+
+
+def test_switches(clean_log_cfg):
+    from devapps.app import switches
+
+    argv = ['colors=false', '--batch', '-', '-j', '2', 'calc.py', '-j', '3']
+    sw = {'batch': '-', 'jobs': 2, 'argv': ['-j', '3']}
+    assert switches(argv) == sw
+    # the class, or (not found) the first app arg:
+    assert argv == ['colors=false', 'module_name=calc.py', 'class_name=-j']
+    argv = ['calc.py', 'Calc', '--batch', 'f']
+    assert switches(argv) == {'argv': ['Calc', '--batch', 'f']}
+    assert argv == ['module_name=calc.py', 'class_name=Calc']
+    argv = ['--serve', '--socket', 's', 'calc.py', 'k=1']
+    sw = {'serve': True, 'socket': 's', 'argv': ['k=1']}
+    assert switches(argv) == sw
+    assert argv == ['module_name=calc.py']
+    with pytest.raises(Exception) as einfo:
+        switches(['-j', '2', 'calc.py'])
+    assert einfo.value.args[0] == common.Exc.switch_requires
+
+
+def devapp(tmpdir, argv, **kw):
+    import os
+    import subprocess as sp
+
+    cmd = [sys.executable, '-c', 'from devapps.app import run; run()']
+    src = os.path.dirname(os.path.dirname(os.path.abspath(common.__file__)))
+    # indexes and caches not into the user's dirs:
+    env = dict(os.environ, PYTHONPATH=src, XDG_CONFIG_HOME=str(tmpdir))
+    kw.setdefault('stdout', sp.PIPE)
+    p = sp.Popen(cmd + argv, cwd=str(tmpdir), env=env, **kw)
+    return p
+
+
+def test_module_names(tmpdir):
+    # no prefixes or short forms of devapp's own actions:
+    for name in ('se', 'co'):
+        tmpdir.join(name + '.py').write(
+            'class App:\n'
+            '    def do_run(app, a=1):\n'
+            '        return "%s %%s" %% a\n' % name
+        )
+        out = devapp(tmpdir, [name + '.py', '2']).communicate()[0]
+        assert out.decode() == '%s 2\n' % name
+    argv = ['--completion', '--prog', 'x', 'co.py']
+    out = devapp(tmpdir, argv).communicate()[0].decode()
+    assert "complete -o nospace -F _devapps_x 'x'" in out
+    assert tmpdir.join('devapps', 'compl', 'x.tsv').check()
+
+
+def test_batch_argvs():
+    from devapps.app import batch_argvs
+
+    lines = ['a=1 "x y"\n', '\n', '# c\n', '{"a": [1], "i": {"b": "c"}}\n']
+    assert list(batch_argvs(lines, ['k=v'])) == [
+        (1, ['k=v', 'a=1', 'x y']),
+        (4, ['k=v', 'a=[1]', 'i.b=c']),
+    ]
+
+
+def test_batch(tmpdir):
+    import json
+    import subprocess as sp
+
+    tmpdir.join('bapp.py').write(
+        'class Bapp:\n'
+        '    k = 1\n\n'
+        '    def do_run(app, a=1):\n'
+        '        print("noise")\n'
+        '        return app.k * a\n'
+    )
+    argv = ['--batch', '-', '-j', '2', '--ordered', 'bapp.py', 'k=3']
+    p = devapp(tmpdir, argv, stdin=sp.PIPE, stderr=sp.PIPE)
+    out, err = p.communicate(b'1\n{"a": 2}\n\n# c\nk=1 3\na=x\n5\n')
+    assert p.returncode == 1
+    # the app's output not in the results:
+    res = [json.loads(l) for l in out.decode().splitlines()]
+    assert err.decode().count('noise') == 4
+    # the line numbers:
+    assert [r['i'] for r in res] == [1, 2, 5, 6, 7]
+    assert [r.get('result') for r in res] == [3, 6, 3, None, 15]
+    assert res[3]['error'][1] == 'Cannot cast'
+    # no such file: logged, no traceback
+    argv[argv.index('-')] = 'nope'
+    p = devapp(tmpdir, argv, stderr=sp.PIPE)
+    out, err = p.communicate()
+    assert p.returncode == 1 and not out
+    assert b'File not found' in err and not b'Traceback' in err
+    # batch switches w/o --batch:
+    p = devapp(tmpdir, ['-j', '2', 'bapp.py'], stderr=sp.PIPE)
+    out, err = p.communicate()
+    assert p.returncode == 1 and b'Switch requires' in err
@@ -0,0 +1,45 @@
+"""
+The benchmark suite (benchmarks/bench_configure.py) must keep working, we run
+it here in quick mode - timings are not checked, the baselines are machine
+specific.
+"""
+import os
+import sys
+import pytest
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(here, '..', 'benchmarks'))
+
+import bench_configure as bench
+
+
+# configure populates the logger (see conftest):
+pytestmark = pytest.mark.usefixtures('clean_log_cfg')
+
+
+def test_generators():
+    App = bench.make_app(n_attrs=20, depth=3, n_actions=5)
+    cfg, kvs = bench.make_cfg(n_attrs=20, depth=3)
+    assert len(kvs) == 60
+    assert cfg['nested']['nested']['ax_ax_bx'] == 'foo'
+    C, func = bench.configure(App, bench.CLI(bench.make_argv(kvs, 'short')))
+    app = C()
+    assert app.nested.nested.ax_ax_ax == 42
+    assert app.ax_ax_ex == [1, 2]
+    assert func(app) == 1
+
+
+def test_quick_run(capsys):
+    # no baseline compare for tests:
+    bench.fn_baselines = '/nonexisting'
+    assert bench.main(['-q', 'flat_10', 'mix']) == 0
+    out = capsys.readouterr().out
+    assert 'flat_10_short' in out and 'mix_100' in out
+
+
+def test_file_cache_bench(capsys):
+    import bench_file_cache
+
+    # runs, the ratio is not checked here:
+    assert bench_file_cache.main(0.05, 1e9) == 0
+    assert 'json.loads' in capsys.readouterr().out
@@ -76,6 +76,20 @@ class Test_custom(object):
         assert 'no_answer' in str(einfo.value)
 
 
+def test_memo_invalidated_by_add_caster():
+    class Meters(float):
+        def __new__(cls, s, dflt=None, ctx=None):
+            return float.__new__(cls, str(s).replace('m', ''))
+
+    # via the mro -> float caster, memoized:
+    assert type(cast('3', Meters(1))) == float
+    assert type(cast('4', Meters(1))) == float
+    cast.add_caster(Meters)
+    res = cast('3m', Meters(1))
+    assert type(res) == Meters and res == 3.0
+    assert cast(['1m', '2m'], [Meters(1)]) == [1.0, 2.0]
+
+
 def test_str_or_func_lookup():
     # fmt: off
     assert cast(42.5    , cast.nearest_int ) == 43
@@ -121,6 +135,129 @@ def test_dict():
     assert cast('{"a": {"b":"c"}}', {}) == {'a': {'b': 'c'}}
 
 
+def test_typed_arrays():
+    from array import array
+
+    assert cast('1, 2,3', array('q')) == array('q', [1, 2, 3])
+    assert cast('[1.5,2]', array('d')) == array('d', [1.5, 2])
+    assert cast('1.5,2', array('i')) == array('i', [1, 2])
+    assert cast(' ', array('i')) == array('i')
+    assert cast([1, '2', 3.0], array('f')) == array('f', [1, 2, 3])
+    assert cast('1', array) == array('d', [1])
+    with pytest.raises(Exception) as einfo:
+        cast('1,a', array('q'))
+    assert einfo.value.args[0] == Exc.cannot_cast
+
+
+def test_typed_numpy_arrays():
+    np = pytest.importorskip('numpy')
+    a = cast('1, 2,3', np.zeros(0, dtype=np.int32))
+    assert a.dtype == np.int32 and list(a) == [1, 2, 3]
+    assert list(cast('1.5,2', np.zeros(0, dtype=int))) == [1, 2]
+    assert cast('', np.zeros(0)).shape == (0,)
+    a = cast('1,2,3,4', np.zeros((0, 2)))
+    assert a.shape == (2, 2) and a[1, 0] == 3.0
+    assert cast('[[1, 2]]', np.zeros((0, 2))).shape == (1, 2)
+    assert list(cast([1, 2], np.ndarray)) == [1.0, 2.0]
+
+
+def write_npy(fn, descr, shape, data):
+    # .npy format 1.0, w/o numpy:
+    import struct
+
+    h = "{'descr': '%s', 'fortran_order': False, 'shape': %r, }" % (
+        descr,
+        shape,
+    )
+    h += ' ' * (63 - 10 - len(h)) + '\n'
+    with open(fn, 'wb') as fd:
+        fd.write(b'\x93NUMPY\x01\x00' + struct.pack('<H', len(h)))
+        fd.write(h.encode('latin1'))
+        data.tofile(fd)
+
+
+def test_filepath(tmpdir):
+    from array import array
+    from devapps.casting import filepath
+
+    raw, npy = str(tmpdir.join('t.bin')), str(tmpdir.join('t.npy'))
+    with open(raw, 'wb') as fd:
+        array('d', [1.5, 2, 3]).tofile(fd)
+    write_npy(npy, '<i4', (2, 3), array('i', range(6)))
+
+    m = cast(raw, filepath('d'))
+    assert m.readonly and m.tolist() == [1.5, 2, 3]
+    assert len(cast(raw, filepath)) == 24
+    m = cast(npy, filepath)
+    assert m.shape == (2, 3) and m.tolist() == [[0, 1, 2], [3, 4, 5]]
+    assert cast(npy, filepath('i'))[1, 2] == 5
+    for fn, f in ((npy, 'd'), (raw, 'x'), (raw + '.missing', 'd')):
+        with pytest.raises(Exception) as einfo:
+            cast(fn, filepath(f))
+        assert einfo.value.args[0] == Exc.cannot_cast
+
+
+def test_filepath_numpy(tmpdir):
+    np = pytest.importorskip('numpy')
+    from devapps.casting import filepath
+
+    fn = str(tmpdir.join('t.npy'))
+    np.save(fn, np.arange(6, dtype=np.int32).reshape(2, 3))
+    m = cast(fn, filepath)
+    assert isinstance(m, np.memmap) and m[1, 2] == 5
+    np.arange(3, dtype='<f8').tofile(fn + '.raw')
+    assert list(cast(fn + '.raw', filepath('d'))) == [0, 1, 2]
+
+
+def test_parse_struct(monkeypatch):
+    from devapps import casting, conv_str
+
+    # json first, python syntax via literal_eval:
+    assert cast('{"a": [1, true, null]}', {}) == {'a': [1, True, None]}
+    assert cast("{'a': (1, 2)}", {}) == {'a': (1, 2)}
+    assert cast('[1, "2"]', []) == [1, '2']
+    assert cast("['1', 2,]", ()) == ('1', 2)
+    assert cast('(1, 2)', []) == [1, 2]
+    assert conv_str('{"a": 1}') == {'a': 1}
+    assert conv_str('[a]') == '[a]'
+
+    monkeypatch.setitem(casting.CFG, 'max_literal_len', 10)
+    assert cast('[1, 2, 3, 4, 5]', []) == [1, 2, 3, 4, 5]
+    for s in ("['a', 'b', 'c']", '[' * 20, '(1, 2, 3, 4, 5)'):
+        with pytest.raises(Exception) as einfo:
+            cast(s, [])
+        assert einfo.value.args[0] == Exc.value_too_long
+    monkeypatch.setitem(casting.CFG, 'max_len', 10)
+    for v in ('[1, 2, 3, 4, 5]', '{' * 11):
+        with pytest.raises(Exception) as einfo:
+            conv_str(v)
+        assert einfo.value.args[0] == Exc.value_too_long
+    with pytest.raises(Exception) as einfo:
+        cast('[1, 2, 3, 4, 5]', [])
+    assert einfo.value.args[0] == Exc.value_too_long
+
+
+def test_dict_schema():
+    schema = {'port': 80, 'hosts': [str], 'tls': {'on': False, 'v': 1.2}}
+    res = cast(
+        {'port': '81', 'hosts': 'a,b', 'tls': {'on': '1'}, 'x': '1'}, schema
+    )
+    assert res['port'] == 81 and res['hosts'] == ['a', 'b']
+    assert res['tls'] == {'on': True} and res['x'] == '1'
+    assert cast('{"tls": "{\'v\': \'2\'}"}', schema) == {'tls': {'v': 2.0}}
+    assert cast('port: 82, x:y', schema) == {'port': 82, 'x': 'y'}
+    # compiled once per default object:
+    assert cast.schema(schema) is cast.schema(schema)
+    # None: any value
+    assert cast({'a': 1, 'b': 2}, {'a': 's', 'b': None}) == {'a': '1', 'b': 2}
+    # errors at the innermost key:
+    for v, k in ({'port': 'http'}, 'port'), ({'tls': {'v': 'x'}}, 'v'):
+        with pytest.raises(Exception) as einfo:
+            cast([v], [schema])
+        assert einfo.value.args[0] == Exc.cannot_cast
+        assert einfo.value.args[1]['key'] == k
+
+
 def test_nested_typed():
     assert cast(['1'], [0]) == [1]
     assert cast('[1,2,4.6]', [int]) == [1, 2, 4]
@@ -0,0 +1,17 @@
+"""
+Import time of the devapp entry point: Our apps are run many times from
+shell pipelines, imports we don't need for a run must not be done.
+The time itself benchmarks/bench_import.py measures (not here, flaky).
+"""
+import sys
+import subprocess as sp
+
+# must only be imported on use:
+lazy = ('pdb', 'json', 'appdirs', 'hashlib', 'devapps.help', 'structlog')
+
+
+def test_no_eager_imports():
+    code = 'import sys, devapps.app; print(" ".join(sys.modules))'
+    mods = sp.check_output([sys.executable, '-c', code]).decode().split()
+    assert [m for m in lazy if m in mods] == []
+
@@ -0,0 +1,65 @@
+import os
+import subprocess as sp
+import tempfile
+
+import attr
+import pytest
+
+from devapps import completion
+
+completion.CFG['dir'] = tempfile.mkdtemp()
+
+
+class App:
+    verbose = False
+    mode = attr.ib('a', validator=attr.validators.in_(['a', 'b']))
+
+    class inner:
+        count = 1
+
+        class deep:
+            dflag = bool
+
+            def do_dump(app):
+                pass
+
+    def do_run(app, a=1):
+        pass
+
+
+def test_index():
+    rows = completion.index(App)
+    assert ('', 'a', 'run', 'run') in rows
+    assert ('', 'k', 'v', 'verbose') in rows
+    assert ('', 'v', 'verbose', 'true') in rows
+    assert ('', 'v', 'mode', 'b') in rows
+    assert ('inner', 's', 'deep', 'deep') in rows
+    assert ('inner.deep', 'v', 'dflag', 'false') in rows
+    assert ('inner.deep', 'a', 'dump', 'dump') in rows
+
+
+@pytest.mark.skipif(
+    sp.call('bash -c "type awk" > /dev/null 2>&1', shell=True) != 0,
+    reason='no bash or awk',
+)
+def test_bash():
+    script = completion.write(App, 'myapp')
+    assert script.endswith("complete -o nospace -F _devapps_myapp 'myapp'\n")
+    fn = os.path.join(completion.CFG['dir'], 'myapp.tsv')
+    assert os.path.exists(fn)
+
+    def complete(line):
+        sh = '%s\nCOMP_LINE="myapp %s"; COMP_POINT=${#COMP_LINE}\n'
+        sh += '_devapps_myapp; printf "%%s\\n" "${COMPREPLY[@]}"'
+        out = sp.check_output(['bash', '-c', sh % (script, line)])
+        return sorted(out.decode().split())
+
+    assert complete('') == ['inner.', 'mode=', 'run', 'verbose=']
+    assert complete('in') == ['inner.']
+    assert complete('i.d') == ['i.deep.']
+    assert complete('inner.deep.') == ['inner.deep.dflag=', 'inner.deep.dump']
+    # bash splits at '=', we complete the part after it:
+    assert complete('mode=') == ['a', 'b']
+    assert complete('i.d.df=f') == ['false']
+    assert complete('run v') == ['verbose=']
+    assert complete('x.') == []
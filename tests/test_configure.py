@@ -1,3 +1,4 @@
+import copy
 import pytest
 import sys
 import time
@@ -10,6 +11,7 @@ from functools import partial
 
 dn = os.path.dirname
 import devapps
+import devapps.help
 
 # sys.path.insert(0, dn(dn(os.path.abspath(__file__))))
 # import setup_method as devapps
@@ -42,6 +44,10 @@ configure = partial(devapps.configure, log=logger)
 
 fn_test = tempfile.mkstemp()[1] + '.test_mdv'
 
+# scan results and help texts not into the user's config dir:
+devapps.scan.CFG['dir'] = tempfile.mkdtemp()
+devapps.help.CFG['dir'] = tempfile.mkdtemp()
+
 
 def clear(l):
     # py2 compat:
@@ -74,6 +80,64 @@ def test_to_shorts():
     assert res == {'foo_e': 1}
 
 
+def test_to_shorts_collisions():
+    # more than two colliding shorts, shorts colliding with a long:
+    res = devapps.to_shorts(['ab', 'ac', 'ad', 'run', 'r_u_nx'])
+    assert res['run'] == 'run'
+    assert res['ad'] == 'ad' and 'a' not in res
+    longs = ['foo_bar_baz', 'foo_baz_baz', 'f_b_baz', 'f_bazz']
+    with pytest.raises(Exception):
+        devapps.to_shorts(longs)
+    c = {}
+    res = devapps.to_shorts(longs, collisions=c)
+    assert c == {'fbbaz': longs[:3]}
+    assert 'fbbaz' not in res and res['fbazz'] == 'f_bazz'
+
+
+def test_short_prefix_index():
+    longs = ['opt_%s_%s' % (chr(97 + i % 26), i) for i in range(500)]
+    ctx = {'shorts': devapps.to_shorts(longs)}
+    ctx['short_keys'] = sorted(ctx['shorts'])
+    res = devapps.short_to_long(0, {'opt_z_49': 1, 'oz51': 2}, 0, ctx)
+    assert res['opt_z_493'] == 1
+    assert res['opt_z_51'] == 2
+    with pytest.raises(Exception):
+        devapps.short_to_long(0, {'opt_a_1': 1}, 0, ctx)
+    assert log[-1]['event'] == Exc.non_unique
+    have = ['opt_a_104', 'opt_a_130', 'opt_a_156', 'opt_a_182']
+    assert log[-1]['have'] == have
+
+
+def test_env_trie():
+    env = {
+        'App_b_dflt': 'x',
+        'App_inner_s_i': 'y',
+        'App_inner_deep_l': '[1, 2]',
+        'App_inner_deep_d': '{bad',
+        'Other_b_dflt': 'z',
+    }
+    t = devapps.EnvTrie.build(env, 'App_')
+    deep = t.node('inner').node('deep')
+    # converted on access only:
+    assert deep.node('d').raw
+    assert deep.get('d') == '{bad'
+    assert not deep.node('d').raw
+    # structured ones per access, apps get their own:
+    assert deep.get('l') == [1, 2]
+    assert deep.node('l').raw and deep.get('l') is not deep.get('l')
+    assert dict(t.items()) == {
+        'b_dflt': 'x',
+        'inner_s_i': 'y',
+        'inner_deep_l': [1, 2],
+        'inner_deep_d': '{bad',
+    }
+    assert t.get('b') is None and t.get('b_dflt') == 'x'
+    assert deep.pop('_orig_shorts_', 0) == 0
+    assert t.node('inner') and not t.node('x')
+    deep.pop('l'), deep.pop('d')
+    assert not deep and 'inner_s_i' in t
+
+
 userdir = lambda fn: os.path.join(user_config_dir(), fn)
 
 
@@ -101,6 +165,69 @@ class TestFile(object):
             f = devapps.File(FooApp, ignore_missing=False)
         assert einfo.value.args[0] == Exc.file_not_found
 
+    def test_file_cache(self):
+        class App:
+            l = [1]
+
+        write_file({'l': [1, 2]})
+        f1, f2 = devapps.File(fn_test), devapps.File(fn_test)
+        assert f1.cfg() is f2.cfg()
+        app = configure(App, f1)[0]()
+        # shared, not copied - so read only:
+        assert app.l is f1.cfg()['l']
+        with pytest.raises(TypeError):
+            app.l.append(3)
+        l = list(app.l)
+        l.append(3)
+        assert copy.deepcopy(app.l) + [3] == l
+        assert f1.cfg() == {'l': [1, 2]}
+        # cast ones (by a dict default's schema) are the app's own:
+        App.d = {'x': 1.0}
+        write_file({'l': [1, 2], 'd': {'x': 2}})
+        app = configure(App, devapps.File(fn_test))[0]()
+        app.d['y'] = 3
+        assert app.d == {'x': 2.0, 'y': 3}
+        write_file({'l': [1, 2, 3]})
+        f3 = devapps.File(fn_test)
+        assert f3.cfg() == {'l': [1, 2, 3]}
+        os.unlink(fn_test)
+
+    def test_file_types(self):
+        class App:
+            i = 1
+            s = 's'
+
+            class inner:
+                f = 1.0
+
+        d = tempfile.mkdtemp()
+        files = {
+            'c.toml': 'i = 2\ns = "x"\n[inner]\nf = 2.5\n',
+            'c.ini': '[DEFAULT]\ni = 2\ns = x\n[inner]\nf = 2.5\n',
+            'c.cfg': '[DEFAULT]\ni = 2\ns = x\n[inner]\nf = 2.5\n',
+        }
+        try:
+            import yaml
+
+            files['c.yml'] = 'i: 2\ns: x\ninner:\n  f: 2.5\n'
+        except ImportError:
+            pass
+        for fn, s in files.items():
+            fn = os.path.join(d, fn)
+            with open(fn, 'w') as fd:
+                fd.write(s)
+            app = configure(App, File(fn))[0]()
+            assert (app.i, app.s, app.inner.f) == (2, 'x', 2.5)
+
+    def test_ini_default_not_in_sections(self):
+        from devapps import load_ini
+
+        s = b'[DEFAULT]\ni = 2\n[inner]\nf = 2.5\n[inner.deep]\ng = 1\n'
+        r = load_ini(s)
+        assert r['i'] == '2'
+        assert dict(r['inner']['deep']) == {'g': '1'}
+        assert sorted(r['inner']) == ['deep', 'f']
+
 
 class TestCliPreParser(object):
     def setup_method(self):
@@ -417,11 +544,15 @@ class TestConfigure(object):
             foo_bar_baz = 1
             foo_baz_baz = 2
 
+        # complaining only when a colliding short is used:
+        clear(log)
+        app = configure(App, CLI(['foo_bar_baz=3'], set_runner_func=False))[0]
+        assert app().foo_bar_baz == 3
+        assert not [l for l in log if l['level'] == 'error']
         with pytest.raises(Exception) as einfo:
-            # needs an argument, otherwise the cli is not even checked for
-            # short collisions:
-            configure(App, CLI(['x'], set_runner_func=False))
+            configure(App, CLI(['fbbaz=3'], set_runner_func=False))
         assert log[-1]['event'] == Exc.cannot_build_unique_short_form
+        assert log[-1]['colliding'] == ['foo_bar_baz', 'foo_baz_baz']
 
     def test_file_struct(self):
         class App:
@@ -538,6 +669,85 @@ class TestConfigure(object):
         assert func(app()) == 1
 
 
+class TestHelpCache(object):
+    def setup_method(self):
+        class App:
+            """The app"""
+
+            foo = 1
+
+            def do_run(app, a=1):
+                """Runs"""
+
+        self.App = App
+
+    def help(self, argv):
+        app, func = devapps.configure(self.App, CLI(argv))[:2]
+        return func(app())
+
+    def test_cached(self, monkeypatch):
+        h = self.help(['-hh'])
+        assert '# App' in h and 'Runs' in h
+        monkeypatch.setattr(devapps.help, 'sections', lambda *a: ['bad'])
+        assert self.help(['-hh']) == h
+        # other values, levels, widths, sources: rendered
+        assert self.help(['foo=2', '-hh']) == 'bad'
+        assert self.help(['-h']) == 'bad'
+        monkeypatch.setenv('COLUMNS', '123')
+        assert self.help(['-hh']) == 'bad'
+        monkeypatch.setattr(devapps.scan, 'file_hash', lambda fn: 'changed')
+        assert self.help(['-hh']) == 'bad'
+
+    def test_action_defaults(self):
+        h = self.help(['run.a=5', '-hh'])
+        assert '5' in h
+        h = self.help(['run.a=6', '-hh'])
+        assert '6' in h and not '5' in h
+        assert self.help(['-hh']) != h
+
+    def test_levels_and_subtree(self):
+        class App:
+            a = 1
+
+            class inner:
+                b = 2
+
+                class deep:
+                    c = 3
+
+                    def do_d(app):
+                        """deep action"""
+
+            class other:
+                o = 4
+
+        self.App = App
+        h = self.help(['-h'])
+        assert '## inner\n' in h and '## other' in h and 'deep' not in h
+        h = self.help(['-hh'])
+        assert '## inner.deep\n' in h and 'deep action' in h
+        for argv in ['-h', 'inner.deep'], ['-hh', 'i.d'], ['-hu', 'i.deep']:
+            h = self.help(argv)
+            assert h.startswith('\n# inner.deep\n') and 'deep action' in h
+            assert 'other' not in h and '## inner\n' not in h
+        h = self.help(['-h', 'inner'])
+        assert '# inner\n' in h and '## inner.deep\n' in h and 'other' not in h
+        with pytest.raises(Exception) as einfo:
+            self.help(['-h', 'inner.xx'])
+        assert einfo.value.args[0] == Exc.unmatched
+
+        # streamed:
+        app = devapps.configure(App, CLI(['-h']))[0]()
+        sects = devapps.help.iter_help(app, 'hh', path='inner')
+        assert next(sects).startswith('\n# inner\n')
+        assert '# inner.deep' in ''.join(sects)
+
+    def test_termsize(self, monkeypatch):
+        monkeypatch.setenv('COLUMNS', '123')
+        monkeypatch.setenv('LINES', '12')
+        assert devapps.help.termsize() == (12, 123)
+
+
 class TestConfigureRunner(object):
     def setup_method(self):
         class App:
@@ -571,3 +781,373 @@ class TestConfigureRunner(object):
         )[:2]
         res = func(app())
         assert res == ('sth', 1.2, 3, 2, 5)
+
+
+class TestActionGraph(object):
+    def setup_method(self):
+        calls = self.calls = []
+
+        class App:
+            n = 1
+
+            def do_fetch(app, k=2):
+                calls.append('fetch')
+                time.sleep(0.1)
+                return app.n * k
+
+            def do_slow(app):
+                time.sleep(0.1)
+                return 'slow'
+
+            @devapps.needs('fetch', 'inner.parse')
+            def do_report(app, fetch, inner_parse, sep='-'):
+                return '%s%s%s' % (fetch, sep, inner_parse)
+
+            class inner:
+                @devapps.needs('fetch')
+                def do_parse(inner, fetch):
+                    return fetch + 1
+
+                @devapps.needs('parse')
+                def do_loop(inner):
+                    pass
+
+                @devapps.needs('loop')
+                def do_parse2(inner):
+                    pass
+
+        self.App = App
+
+    def run(self, argv):
+        A, func = configure(self.App, CLI(argv))
+        return func(A())
+
+    def test_several(self):
+        res = self.run(['n=2', 'fetch', 'slow', 'inner.parse'])
+        # fetch once, for itself and as dependency:
+        assert self.calls == ['fetch']
+        assert res == {'fetch': 4, 'slow': 'slow', 'inner.parse': 5}
+
+    def test_dependencies(self):
+        # requested is one, its dependencies run first:
+        assert self.run(['report', 'sep=+']) == '2+3'
+        assert self.run(['report', '+']) == '2+3'
+        # args of a dependency do not request it:
+        assert self.run(['report', 'fetch.k=3']) == '3-4'
+        res = self.run(['n=2', 'fetch.k=3', 'slow', 'inner.parse'])
+        assert res == {'slow': 'slow', 'inner.parse': 7}
+        res = self.run(['rep', 'i.parse'])
+        assert res == {'report': '2-3', 'inner.parse': 3}
+
+    def test_serial(self, monkeypatch):
+        # py2, no concurrent.futures:
+        monkeypatch.setitem(sys.modules, 'concurrent.futures', None)
+        res = self.run(['n=2', 'report', 'slow', 'inner.parse'])
+        assert res == {'report': '4-5', 'slow': 'slow', 'inner.parse': 5}
+        assert self.calls == ['fetch']
+
+    def test_errors(self):
+        with pytest.raises(Exception):
+            self.run(['fetch', 'slow', '3'])
+        assert log[-1]['event'] == Exc.args_of_several_actions
+        with pytest.raises(Exception):
+            self.run(['report', '+', 'x'])
+        assert log[-1]['event'] == Exc.unmatched
+        assert log[-1]['unknown'] == ['x']
+        self.App.inner.do_loop._needs_ = ('parse2',)
+        with pytest.raises(Exception):
+            self.run(['inner.parse2'])
+        assert log[-1]['event'] == Exc.cyclic_dependency
+        assert log[-1]['actions'] == ['inner.parse2', 'inner.loop']
+        self.App.inner.do_loop._needs_ = ('nope',)
+        with pytest.raises(Exception):
+            self.run(['inner.loop'])
+        assert log[-1]['event'] == Exc.unmatched
+
+
+class TestScanCache(object):
+    def setup_method(self):
+        class App:
+            foo_bar = 1
+
+            def do_run(app, a=1):
+                return app.foo_bar, a
+
+            class Inner:
+                ifoo = 2
+
+        self.App = App
+        fn = self.cache_file()
+        os.unlink(fn) if os.path.exists(fn) else 0
+
+    def cache_file(self):
+        scan = devapps.scan
+        return scan.cache_file(self.App, scan.src_file(self.App))
+
+    def test_stored_and_used(self):
+        app, func = configure(self.App, CLI(['fb=2', '3']))
+        assert func(app()) == (2, 3)
+        with open(self.cache_file()) as fd:
+            inv = json.loads(fd.read())['classes']
+        assert inv['']['funcs'] == ['run']
+        assert inv['']['inner'] == ['Inner']
+        assert inv['Inner']['attrs'] == ['ifoo']
+        assert inv['']['shorts']['fb'] == 'foo_bar'
+
+        # we are used, not scanning again:
+        inv['Inner']['attrs'] = []
+        stored = {'version': devapps.__version__, 'files': {}, 'classes': inv}
+        self.setup_method()
+        fn = self.cache_file()
+        with open(fn, 'w') as fd:
+            fd.write(json.dumps(stored))
+        app = configure(self.App, CLI([], set_runner_func=False))[0]
+        assert attr.asdict(app().Inner) == {}
+
+    def test_invalidated_by_source_change(self):
+        configure(self.App, CLI([], set_runner_func=False))
+        with open(self.cache_file()) as fd:
+            stored = json.loads(fd.read())
+        assert list(stored['files']) == [os.path.abspath(__file__)]
+        st = stored['files'][os.path.abspath(__file__)]
+        assert devapps.scan.valid(self.App, stored)
+        # stat differing, the hash decides:
+        st[1] = 0
+        assert devapps.scan.valid(self.App, stored)
+        assert stored.pop('touched') and st[1]
+        st[1:] = [0, 0]
+        st[0] = 'changed'
+        assert not devapps.scan.valid(self.App, stored)
+
+    def test_unchanged_not_hashed(self, monkeypatch):
+        configure(self.App, CLI([], set_runner_func=False))
+        with open(self.cache_file()) as fd:
+            stored = json.loads(fd.read())
+        monkeypatch.setattr(devapps.scan, 'file_hash', lambda fn: 1 / 0)
+        assert devapps.scan.valid(self.App, stored)
+
+    def test_pruned(self, tmpdir, monkeypatch):
+        monkeypatch.setitem(devapps.scan.CFG, 'max_files', 3)
+        for i in range(5):
+            fn = str(tmpdir.join('%s.json' % i))
+            devapps.scan.store(fn, {})
+            os.utime(fn, (i, i))
+        assert sorted(os.listdir(str(tmpdir))) == [
+            '2.json',
+            '3.json',
+            '4.json',
+        ]
+
+    def test_invalidated_by_runtime_changes(self):
+        configure(self.App, CLI([], set_runner_func=False))
+        self.setup_method()
+        self.App.Inner.ibar = 3
+        app = configure(self.App, CLI([], set_runner_func=False))[0]
+        assert app().Inner.ibar == 3
+
+
+class TestPlan(object):
+    def setup_method(self):
+        class App:
+            foo = 1
+            ai = attr.ib(1.1, converter=lambda x: x + x)
+
+            def do_run(app, a=1):
+                return app.foo, app.ai, app.Inner.ifoo, a
+
+            class Inner:
+                ifoo = int
+
+        self.App = App
+
+    def test_reuse(self):
+        plan = devapps.compile(self.App)
+        app1, func1 = plan.configure(CLI(['foo=2', 'I.i=3', 'ai=1', '4']))
+        app2, func2 = plan.configure(CLI(['I.i=5']))
+        assert func1(app1()) == (2, 2.0, 3, 4)
+        assert func2(app2()) == (1, 2.2, 5, 1)
+        # first configured class not affected by the second run:
+        assert app1().foo == 2
+
+    def test_user_class_untouched(self):
+        App = self.App
+        app = configure(App, CLI(['foo=2', 'I.i=3'], set_runner_func=False))[0]
+        assert issubclass(app, App) and app is not App
+        assert app.__qualname__ == App.__qualname__
+        assert App.foo == 1
+        assert App.Inner.ifoo == int
+        assert not hasattr(App, '__attrs_attrs__')
+        # configurable again:
+        app = configure(App, CLI(['I.i=4'], set_runner_func=False))[0]
+        assert attr.asdict(app()) == {'foo': 1, 'ai': 2.2, 'Inner': {'ifoo': 4}}
+
+    def test_immutable(self):
+        plan = devapps.compile(self.App)
+        with pytest.raises(attr.exceptions.FrozenInstanceError):
+            plan.root = None
+        assert [l[0] for l in plan.root.attrs] == ['Inner', 'ai', 'run', 'foo']
+
+
+class TestReentrant(object):
+    def setup_method(self):
+        class App:
+            foo = 1
+
+            def do_run(app, a=1, b=2.0):
+                return app.foo, a, b
+
+            class Inner:
+                def do_inner(inner, c=3):
+                    return c
+
+        self.App = App
+
+    def test_configure_same_app_again(self):
+        App = self.App
+        app1, func1 = configure(App, CLI(['foo=2', 'run.b=3', '4']))
+        app2, func2 = configure(App, CLI(['foo=5', '6']))
+        assert func1(app1()) == (2, 4, 3.0)
+        assert func2(app2()) == (5, 6, 2.0)
+        # function defaults of the user's class not changed:
+        assert App.do_run.__defaults__ == (1, 2.0)
+        assert app1.do_run.__defaults__ == (1, 3.0)
+        assert app2.do_run is App.do_run
+
+    def test_generated_classes_cached(self):
+        def gen(app):
+            # the generated attrs class, below the one carrying the values:
+            return app.__mro__[1]
+
+        App = self.App
+        s = lambda argv: configure(App, CLI(argv, set_runner_func=False))[0]
+        app1, app2, app3 = s(['foo=2']), s(['foo=3']), s([])
+        assert gen(app1) is gen(app2)
+        assert gen(app1) is not gen(app3)
+        assert (app1().foo, app2().foo, app3().foo) == (2, 3, 1)
+        assert gen(app1().Inner.__class__) is gen(app3().Inner.__class__)
+
+    def test_plan_recompiled_on_class_change(self):
+        App = self.App
+        compiled = devapps.plan.compiled
+        plan = compiled(App)
+        assert compiled(App) is plan
+        App.Inner.bar = 1
+        assert compiled(App) is not plan
+        app = configure(App, CLI(['I.bar=2'], set_runner_func=False))[0]
+        assert app().Inner.bar == 2
+
+    def test_caches_bounded(self, monkeypatch):
+        plan = devapps.plan
+        monkeypatch.setitem(plan.CFG, 'max_plans', 2)
+        monkeypatch.setitem(plan.CFG, 'max_shapes', 1)
+        monkeypatch.setattr(plan, 'plans', {})
+        Apps = [type('A%s' % i, (self.App,), {}) for i in range(3)]
+        for A in Apps + Apps[-1:]:
+            plan.compiled(A)
+        assert list(plan.plans) == Apps[1:]
+        cp = plan.compiled(self.App).root
+        for argv in ['foo=1'], []:
+            configure(self.App, CLI(argv, set_runner_func=False))
+        assert list(cp.classes) == [(None, None)]
+
+
+class TestConfigureMany(object):
+    def test_many(self):
+        class App:
+            foo = 1
+            l = [1]
+
+            def do_run(app, a=1):
+                return app.foo, app.l, a
+
+        reads = []
+
+        class CountingEnv(Env):
+            def cfg(env):
+                reads.append(1)
+                return Env.cfg(env)
+
+        os.environ['CM_l'] = '[2, 3]'
+        try:
+            argvs = [['foo=%s' % i, str(i)] for i in range(5)]
+            res = devapps.configure_many(
+                App, argvs, (CountingEnv('CM'),), log=logger
+            )
+        finally:
+            del os.environ['CM_l']
+        assert reads == [1]
+        assert [run() for app, run in res] == [
+            (i, [2, 3], i) for i in range(5)
+        ]
+        # no shared values between the instances:
+        res[0][0].l.append(4)
+        assert res[1][0].l == [2, 3]
+
+
+def test_typed_arrays():
+    from array import array
+
+    class App:
+        coords = array('d')
+        ids = attr.ib(array('q'))
+
+        def do_run(app):
+            pass
+
+    os.environ['TA_ids'] = '[1, 2.0, 3]'
+    try:
+        provs = [CLI(['coords=1,2.5', 'run']), Env('TA')]
+        A = devapps.configure(App, provs)[0]
+    finally:
+        del os.environ['TA_ids']
+    app = A()
+    assert app.coords == array('d', [1, 2.5])
+    assert app.ids == array('q', [1, 2, 3])
+
+
+def test_filepath_params(tmpdir):
+    from array import array
+
+    fn = str(tmpdir.join('t.bin'))
+    with open(fn, 'wb') as fd:
+        array('q', [1, 2]).tofile(fd)
+
+    class App:
+        table = devapps.filepath('q')
+        ids = devapps.filepath
+        opt = devapps.filepath('q')
+
+        def do_run(app):
+            pass
+
+    cfg = str(tmpdir.join('cfg.json'))
+    write_file({'ids': fn}, cfg)
+    A = devapps.configure(App, [CLI(['table=%s' % fn, 'run']), File(cfg)])[0]
+    app = A()
+    assert app.table.tolist() == [1, 2] and app.ids.nbytes == 16
+    assert not app.opt
+
+
+def test_dict_schema_from_file(tmpdir):
+    class App:
+        srv = {'port': 80, 'hosts': [str], 'opts': {'retries': 1}}
+
+        def do_run(app):
+            pass
+
+    cfg = str(tmpdir.join('cfg.json'))
+    srv = {'port': '81', 'hosts': [1, 2], 'opts': {'retries': 3.0}}
+    write_file({'srv': srv}, cfg)
+    A = devapps.configure(App, [CLI(['run']), File(cfg)])[0]
+    assert A().srv == {'port': 81, 'hosts': ['1', '2'], 'opts': {'retries': 3}}
+    A = devapps.configure(App, [CLI(['srv={"port": "82"}', 'run'])])[0]
+    assert A().srv == {'port': 82}
+
+
+def test_callable_default_param():
+    class App:
+        def do_run(app, f=len, a=1):
+            return f, a
+
+    A, run = configure(App, CLI(['a=2']))
+    assert run(A()) == (len, 2)
@@ -183,3 +183,66 @@ def test_kw_positional5():
 
 
 # .
+
+
+def test_binding_cached():
+    from devapps.func_sigs import binding
+
+    def f(a, b=1):
+        pass
+
+    b = binding(f, 0)
+    assert binding(f, 0) is b
+    assert b.pos_params == ('a', 'b')
+    assert not b.have_va
+    assert binding(f, 1).pos_params == ('b',)
+    # defaults changed -> new binding:
+    f.__defaults__ = (2.0,)
+    assert binding(f, 0) is not b
+    a, kw = mapf(f, [('a', 1), ('b', '3')], {})
+    assert a == (1, 3.0)
+
+
+def test_binding_cache_weak_and_bounded():
+    import gc
+    from devapps.func_sigs import BindingCache
+
+    c = BindingCache(maxsize=2)
+    fs = [eval('lambda a, b=%s: None' % i) for i in range(3)]
+    for f in fs:
+        c.get(f, 0)
+    # least recently used one evicted:
+    assert len(c.d) == 2
+    assert [r() for r in c.d] == fs[1:]
+    del f
+    fs.pop()
+    gc.collect()
+    assert len(c.d) == 1
+
+
+def test_many_positional():
+    files = ['f%s' % i for i in range(50000)]
+    cli = [('level', '2'), ('slow', 'is_set')]
+    cli += [(fn, 'is_set') for fn in files]
+    a, kw = mapf(lambda mode='fast', level=1, *files: None, cli, {})
+    assert a == tuple(['slow', 2] + files)
+    assert kw == {}
+
+
+def test_positional_keyed_out_of_order():
+    # keyed positional params keep their slot when there are *args:
+    a, kw = mapf(lambda a, A=1, *b: None, [('A', '42'), ('a', 1)], {})
+    assert a == (1, 42)
+    a, kw = mapf(lambda a, A=1, *b: None, [('a', 1), ('A', '42')], {})
+    assert a == (1, 42)
+    a, kw = mapf(lambda a, b=1, c=2, *d: None, [('b', 5), ('x', 'is_set')], {})
+    assert a == ('x', 5, 2)
+
+
+def test_default_without_caster():
+    # casters are resolved only for params given:
+    f = lambda f=len, a=1: (f, a)
+    assert mapf(f, [('a', '2')], {}) == ((len, 2), {})
+    with pytest.raises(Exception) as einfo:
+        mapf(f, [('f', 'x')], {})
+    assert einfo.value.args[0] == Exc.cannot_cast
@@ -0,0 +1,180 @@
+"""
+devapp serve: forked runs of a resident app, for the thin client
+"""
+import os
+import sys
+import time
+import tempfile
+import subprocess as sp
+
+import pytest
+
+import devapps
+import devapps.serve
+from devapps.serve import launch
+
+here = os.path.dirname(os.path.abspath(__file__))
+src = os.path.dirname(os.path.abspath(devapps.serve.__file__))
+
+mod = '''
+import os
+
+class Srv:
+    greet = 'hi'
+
+    def do_run(srv, a=1):
+        return '%s %s %s' % (srv.greet, int(a) + 1, os.getcwd())
+
+    def do_sub(srv):
+        import subprocess
+
+        return subprocess.call(['sh', '-c', 'exit 3'])
+'''
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(devapps.serve.socket, 'AF_UNIX'), reason='no unix sockets'
+)
+
+
+@pytest.fixture
+def server():
+    d = tempfile.mkdtemp()
+    with open(os.path.join(d, 'srv.py'), 'w') as fd:
+        fd.write(mod)
+    sock = os.path.join(d, 's.sock')
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(src))
+    cmd = 'from devapps.app import run; run()'
+    p = sp.Popen(
+        [sys.executable, '-c', cmd, '--serve', '--socket', sock, 'srv.py'],
+        cwd=d,
+        env=env,
+    )
+    for i in range(100):
+        if os.path.exists(sock):
+            break
+        time.sleep(0.05)
+    yield d, sock
+    p.kill()
+    p.wait()
+
+
+def client(sock, *argv, **kw):
+    cmd = [sys.executable, '-S', os.path.join(src, 'serve.py'), sock]
+    p = sp.Popen(cmd + list(argv), stdout=sp.PIPE, stderr=sp.PIPE, **kw)
+    out, err = p.communicate()
+    return p.returncode, out.decode().strip(), err.decode()
+
+
+def test_serve(server):
+    d, sock = server
+    assert client(sock, 'a=41', cwd=here) == (0, 'hi 42 ' + here, '')
+    # env and cwd are the client's:
+    env = dict(os.environ, Srv_greet='ho')
+    assert client(sock, cwd=d, env=env)[:2] == (0, 'ho 2 ' + d)
+    rc, out, err = client(sock, 'a=x', cwd=d)
+    assert rc == 1 and out == ''
+    assert client(sock, 'b=1', cwd=d)[0] == 1
+    # forked runs, the server keeps serving:
+    assert client(sock, 'a=1', cwd=d)[:2] == (0, 'hi 2 ' + d)
+    # the run's own children report their exit status:
+    assert client(sock, 'sub', cwd=d)[:2] == (0, '3')
+
+
+def test_not_ours(server, monkeypatch, capsys):
+    d, sock = server
+    uid = os.getuid()
+    monkeypatch.setattr(os, 'getuid', lambda: uid + 1)
+    assert devapps.serve.client(sock, ['a=1']) == 1
+    assert 'Not connecting' in capsys.readouterr().err
+
+
+def test_socket_dir(monkeypatch):
+    import tempfile
+
+    tmp = tempfile.mkdtemp()
+    monkeypatch.setattr(tempfile, 'tempdir', tmp)
+    monkeypatch.setitem(devapps.serve.CFG, 'dir', None)
+    # not private: not taken
+    os.chmod(tmp, 0o755)
+    monkeypatch.setenv('XDG_RUNTIME_DIR', tmp)
+    fn = devapps.serve.socket_path('x')
+    d = os.path.join(tmp, 'devapps-%s' % os.getuid())
+    assert fn == os.path.join(d, 'devapps.x.sock')
+    assert os.stat(d).st_mode & 0o777 == 0o700
+    os.chmod(tmp, 0o700)
+    fn = devapps.serve.socket_path('x')
+    assert fn == os.path.join(tmp, 'devapps.x.sock')
+    # squatted, made accessible:
+    monkeypatch.delenv('XDG_RUNTIME_DIR')
+    os.chmod(d, 0o777)
+    with pytest.raises(Exception) as ex:
+        devapps.serve.socket_path('x')
+    assert ex.value.args[0] == devapps.common.Exc.not_private
+
+
+def test_no_server():
+    rc, out, err = client('/nonexisting/s.sock')
+    assert rc == 1 and 'No server' in err
+
+
+def test_launch():
+    from devapps.common import plain_logger
+
+    class Env(devapps.Env):
+        reads = []
+
+        def cfg(env):
+            env.reads.append(1)
+            return devapps.Env.cfg(env)
+
+    class App:
+        k = 1
+
+        def do_run(app, a=1):
+            return os.getpid(), app.k + a
+
+    argvs = [['k=%s' % i, str(i)] for i in range(6)] + [['a=x']]
+    os.environ['LA_k'] = '10'
+    try:
+        res = launch(App, argvs, 3, (Env('LA'),), log=plain_logger)
+        res = sorted(res, key=lambda r: r[0])
+    finally:
+        del os.environ['LA_k']
+    # read once, by the parent:
+    assert Env.reads == [1]
+    assert [r[1][1] for r in res[:-1]] == [2 * i for i in range(6)]
+    assert len(set([r[1][0] for r in res[:-1]] + [os.getpid()])) == 7
+    assert res[-1][1] is None and res[-1][2].args[0] == 'Cannot cast'
+    # closed early, the running children are reaped:
+    res = launch(App, [['1']] * 4, 2, (), log=plain_logger)
+    assert next(res)[1][1] == 2
+    res.close()
+    with pytest.raises(OSError):
+        os.waitpid(-1, os.WNOHANG)
+
+
+def test_fork_gc():
+    import gc
+
+    if not hasattr(gc, 'freeze'):
+        pytest.skip('py < 3.7')
+    from devapps.serve import fork
+
+    r, w = os.pipe()
+    pid = fork()
+    if pid == 0:
+        try:
+            st = [gc.isenabled(), gc.get_freeze_count() > 0]
+            os.write(w, repr(st).encode())
+        finally:
+            os._exit(0)
+    os.close(w)
+    os.waitpid(pid, 0)
+    with os.fdopen(r) as fd:
+        # the child collects, but not the objects it shares with us:
+        assert fd.read() == '[True, True]'
+    # ours are restored:
+    assert gc.isenabled() and gc.get_freeze_count() == 0
+    App = type('App', (), {'do_run': lambda app, a=1: a})
+    assert [r[1] for r in launch(App, [['2']], 1, ())] == [2]
+    assert gc.isenabled() and gc.get_freeze_count() == 0
@@ -225,7 +225,7 @@ class TestChapter1:
         """
         )
         md(
-            '> Yes, we did mutate inplace the defaults of the `Calc.do_run` function - i.e. process wide!'
+            '> The defaults are changed on a copy of the `Calc.do_run` function, within the configured class - `Calc` itself is not changed.'
         )
         md(
             '> Keep this in mind when using that feature - reading the source code is then misleading.\n'
@@ -0,0 +1,86 @@
+import os
+import json
+import time
+import tempfile
+import threading
+import attr
+import pytest
+
+import devapps
+from devapps import configure, CLI, File
+from devapps.watch import diff, apply, inotify
+
+devapps.scan.CFG['dir'] = tempfile.mkdtemp()
+
+
+# configure populates the logger (see conftest):
+pytestmark = pytest.mark.usefixtures('clean_log_cfg')
+
+
+class App:
+    i = 1
+    s = 's'
+    l = [1]
+    f = attr.ib(1.0, converter=lambda x: x * 2)
+
+    def do_run(app, a=1):
+        return a
+
+    class inner:
+        b = True
+
+
+def write(fn, d):
+    # new inode, like editors do:
+    with open(fn + '.tmp', 'w') as fd:
+        fd.write(json.dumps(d))
+    os.rename(fn + '.tmp', fn)
+
+
+def test_diff():
+    old = {'a': 1, 'b': {'c': 1, 'd': [1]}, 'e': {'f': 1}}
+    new = {'a': 1, 'b': {'c': 2, 'd': [1, 2]}, 'g': 1}
+    assert diff(old, new) == [('b', 'c'), ('b', 'd'), ('e', 'f'), ('g',)]
+    assert diff(old, old) == []
+
+
+def test_apply():
+    old = {'i': 2, 'inner': {'b': False}}
+    App1 = configure(App, (CLI(['s=cli']), File()))[0]
+    app = App1()
+    new = {'i': 3, 's': 'file', 'f': 2.0, 'inner': {'b': True}}
+    changed = apply(app, old, new)
+    assert len(changed) == 4
+    # s came from the CLI, which has precedence:
+    assert (app.i, app.s, app.f, app.inner.b) == (3, 'cli', 4.0, True)
+    # removed -> default:
+    apply(app, new, {})
+    assert (app.i, app.f) == (1, 2.0)
+
+
+@pytest.mark.parametrize('poll', [True, False])
+def test_watch(poll):
+    if not poll:
+        fd = inotify(__file__)
+        if fd is None:
+            pytest.skip('no inotify')
+        os.close(fd)
+    fn = os.path.join(tempfile.mkdtemp(), 'app.json')
+    write(fn, {'i': 2, 'l': [2]})
+    f = File(fn)
+    app = configure(App, (CLI(['run']), f))[0]()
+    assert (app.i, app.l) == (2, [2])
+    seen, ev = [], threading.Event()
+
+    def cb(app, changed):
+        seen.append(changed)
+        ev.set()
+
+    with f.watch(app, cb, interval=0.02, poll=poll) as w:
+        time.sleep(0.05)
+        write(fn, {'i': 3, 'l': [2], 'inner': {'b': False}, 'run': {'a': 2}})
+        assert ev.wait(5)
+        assert seen == [[('i',), ('inner', 'b'), ('run', 'a')]]
+        assert (app.i, app.inner.b) == (3, False)
+    # the watcher's inotify fd is closed with its thread:
+    assert not w.thread.is_alive() and w.fd is None